@@ -0,0 +1,163 @@
+# api/activity_buffer.py
+# In-process buffer that batches UserActivityLog inserts off the request path
+
+import atexit
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from .models import CustomUser, Machine, Issue, UserActivityLog, UserActivityDailyCount
+
+logger = logging.getLogger(__name__)
+
+# Events kept in memory if the database is unreachable, oldest dropped first
+MAX_PENDING = 10000
+
+
+class ActivityLogBuffer:
+    """
+    Collects activity events in memory and writes them with one bulk_create when
+    ACTIVITY_LOG_BUFFER_SIZE events are waiting, every ACTIVITY_LOG_FLUSH_INTERVAL
+    seconds (background thread), and when the process exits.
+
+    Repeated views of the same machine or issue by the same user within
+    ACTIVITY_LOG_DEDUPE_WINDOW seconds are recorded once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._recent_views = {}  # (user id, activity type, machine id, issue id) -> last time logged
+        self._timer = None
+        self._stop = threading.Event()
+        atexit.register(self.shutdown)
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'ACTIVITY_LOG_BUFFER_ENABLED', False)
+
+    def _is_duplicate_view(self, event):
+        window = settings.ACTIVITY_LOG_DEDUPE_WINDOW
+        if not window or not event.activity_type.endswith('_VIEW'):
+            return False
+        key = (event.user_id, event.activity_type, event.machine_id, event.issue_id)
+        last_logged = self._recent_views.get(key)
+        if last_logged is not None and event.created_at - last_logged < timedelta(seconds=window):
+            return True
+        self._recent_views[key] = event.created_at
+        return False
+
+    # Queues an unsaved UserActivityLog; returns it, or None when it was a repeated view
+    def add(self, event):
+        if event.created_at is None:
+            event.created_at = timezone.now()
+
+        with self._lock:
+            if self._is_duplicate_view(event):
+                return None
+            self._events.append(event)
+            if len(self._events) > MAX_PENDING:
+                del self._events[:len(self._events) - MAX_PENDING]
+            full = len(self._events) >= settings.ACTIVITY_LOG_BUFFER_SIZE
+            self._ensure_timer()
+
+        if full:
+            self.flush()
+        return event
+
+    def flush(self):
+        # Writes everything queued so far; returns the number of rows written
+        with self._lock:
+            events, self._events = self._events, []
+            self._prune_recent_views()
+        if not events:
+            return 0
+
+        try:
+            self._write(events)
+        except IntegrityError:
+            # Foreign keys are checked at commit: a user, machine or issue was deleted after its event was queued
+            self._forget_ids(events)
+            events = self._without_dangling_references(events)
+            try:
+                self._write(events)
+            except Exception:
+                return self._requeue(events)
+        except Exception:
+            return self._requeue(events)
+        return len(events)
+
+    def _write(self, events):
+        with transaction.atomic():
+            UserActivityLog.objects.bulk_create(events, batch_size=500)
+            UserActivityDailyCount.add_logs(events)
+
+    def _forget_ids(self, events):
+        # The transaction was rolled back: forget the ids bulk_create may have assigned
+        for event in events:
+            event.pk = None
+            event._state.adding = True
+
+    def _requeue(self, events):
+        logger.exception(f"Could not write {len(events)} activity log entries, keeping them for the next flush")
+        self._forget_ids(events)
+        with self._lock:
+            self._events[:0] = events
+            if len(self._events) > MAX_PENDING:
+                del self._events[:len(self._events) - MAX_PENDING]
+        return 0
+
+    def _without_dangling_references(self, events):
+        # What the delete did to the saved logs: events of deleted users are dropped, deleted machines and issues cleared
+        def existing(model, ids):
+            return set(model.objects.filter(id__in={obj_id for obj_id in ids if obj_id}).values_list('id', flat=True))
+
+        user_ids = existing(CustomUser, (event.user_id for event in events))
+        machine_ids = existing(Machine, (event.machine_id for event in events))
+        issue_ids = existing(Issue, (event.issue_id for event in events))
+
+        kept = []
+        for event in events:
+            if event.user_id not in user_ids:
+                continue
+            if event.machine_id not in machine_ids:
+                event.machine = None
+            if event.issue_id not in issue_ids:
+                event.issue = None
+            kept.append(event)
+        if len(kept) < len(events):
+            logger.warning(f"Dropped {len(events) - len(kept)} activity log entries of deleted users")
+        return kept
+
+    def _prune_recent_views(self):
+        window = settings.ACTIVITY_LOG_DEDUPE_WINDOW
+        cutoff = timezone.now() - timedelta(seconds=window)
+        self._recent_views = {key: at for key, at in self._recent_views.items() if at >= cutoff}
+
+    def _ensure_timer(self):
+        if self._timer is None or not self._timer.is_alive():
+            self._stop.clear()
+            self._timer = threading.Thread(target=self._run_timer, name='activity-log-flush', daemon=True)
+            self._timer.start()
+
+    def _run_timer(self):
+        while not self._stop.wait(settings.ACTIVITY_LOG_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            finally:
+                # This thread has its own connection; do not keep it open between flushes
+                connection.close()
+
+    def pending(self):
+        with self._lock:
+            return len(self._events)
+
+    def shutdown(self):
+        self._stop.set()
+        self.flush()
+
+
+# Shared buffer for this process
+activity_buffer = ActivityLogBuffer()
@@ -0,0 +1,139 @@
+# api/flat_serializers.py
+# Read-only serializers for hot GET endpoints, built from .values() rows: no model instances and no DRF
+# field per value. Each one returns the same data as the ModelSerializer it stands in for.
+
+from rest_framework import serializers
+from rest_framework.response import Response
+from file_manager.derivatives import image_srcset
+from .models import Solution, TroubleshootingGuide, Step
+from .serializers import attached_files
+from .utils.attachment_utils import AttachmentResolver
+
+# DRF's own formatting (DATETIME_FORMAT and time zone), as in the ModelSerializers
+_datetime = serializers.DateTimeField()
+
+
+def _audit_fields(row):
+    # The trailing created_by / created_at / updated_at of the issue tree serializers
+    return {
+        'created_by': row['created_by'],
+        'created_at': _datetime.to_representation(row['created_at']),
+        'updated_at': _datetime.to_representation(row['updated_at']),
+    }
+
+
+def _with_attachments(context):
+    # The context with a resolver to batch the file lookups in
+    if context.get('attachments') is not None:
+        return context
+    return {**context, 'attachments': AttachmentResolver()}
+
+
+def _steps_by_guide(guide_ids, context):
+    # StepSerializer
+    rows = list(Step.objects.filter(guide_id__in=guide_ids).values(
+        'guide_id', 'id', 'step_number', 'description', 'video_urls'
+    ))
+    context['attachments'].load_files('Step', [row['id'] for row in rows])
+
+    steps = {}
+    for row in rows:
+        files = attached_files(context, 'Step', row['id'])
+        steps.setdefault(row['guide_id'], []).append({
+            'id': row['id'],
+            'step_number': row['step_number'],
+            'description': row['description'],
+            'video_urls': row['video_urls'],
+            'images': [{'id': f.id, 'url': f.file.url, 'srcset': image_srcset(f)} for f in files],
+        })
+    return steps
+
+
+def _guides_by_solution(solution_ids, context):
+    # TroubleshootingGuideSerializer
+    rows = list(TroubleshootingGuide.objects.filter(solution_id__in=solution_ids).values(
+        'solution_id', 'id', 'title', 'created_by', 'created_at', 'updated_at'
+    ))
+    steps = _steps_by_guide([row['id'] for row in rows], context)
+    return {
+        row['solution_id']: {'id': row['id'], 'title': row['title'], 'steps': steps.get(row['id'], []), **_audit_fields(row)}
+        for row in rows
+    }
+
+
+def _solution_rows(solutions, context):
+    # (issue_id, SolutionSerializer data) pairs
+    rows = list(solutions.values('issue_id', 'id', 'description', 'created_by', 'created_at', 'updated_at'))
+    guides = _guides_by_solution([row['id'] for row in rows], context)
+    return [
+        (row['issue_id'], {
+            'id': row['id'],
+            'description': row['description'],
+            # None without a guide: DRF reads the missing reverse one-to-one as None, so SolutionSerializer sends null
+            'guide': guides.get(row['id']),
+            **_audit_fields(row),
+        })
+        for row in rows
+    ]
+
+
+def serialize_solutions(solutions, context):
+    """
+    SolutionSerializer(solutions, many=True).data for a queryset of solutions,
+    with their guides and steps: three queries plus one for the step images.
+    """
+    context = _with_attachments(context)
+    return [data for _, data in _solution_rows(solutions, context)]
+
+
+def serialize_issues(issues, context):
+    """
+    IssueSerializer(issues, many=True).data for a queryset of issues, with the
+    whole tree: four queries plus two for the issue and step images. Issue
+    image URLs are made absolute with context['request'].
+    """
+    context = _with_attachments(context)
+    request = context['request']
+    rows = list(issues.values(
+        'id', 'title', 'description', 'error_code', 'keywords', 'created_by', 'created_at', 'updated_at'
+    ))
+    issue_ids = [row['id'] for row in rows]
+    context['attachments'].load_files('Issue', issue_ids)
+
+    solutions = {}
+    for issue_id, data in _solution_rows(Solution.objects.filter(issue_id__in=issue_ids), context):
+        solutions.setdefault(issue_id, []).append(data)
+
+    serialized = []
+    for row in rows:
+        files = attached_files(context, 'Issue', row['id'])
+        serialized.append({
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'],
+            'error_code': row['error_code'],
+            'keywords': row['keywords'],
+            'solutions': solutions.get(row['id'], []),
+            **_audit_fields(row),
+            'images': [
+                {'id': f.id, 'url': request.build_absolute_uri(f.file.url),
+                 'srcset': image_srcset(f, request.build_absolute_uri)}
+                for f in files
+            ],
+        })
+    return serialized
+
+
+class ValuesListMixin:
+    """
+    list() for viewsets whose serializer only copies model columns (the lookup
+    tables): the rows come from .values() with the serializer's Meta.fields.
+    """
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_serializer_class().Meta.fields
+        queryset = self.filter_queryset(self.get_queryset()).values(*fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(list(page))
+        return Response(list(queryset))
@@ -0,0 +1,94 @@
+# api/machine_cache.py
+# Per-machine version stamps, used to cache serialized machine details and as ETag validators
+
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Issue, Step, MachineVersion
+
+# Stamp replaced whenever any machine changes (lists spanning machines)
+ALL_MACHINES = 'all'
+DETAIL_KEY = 'machine-detail:{}:{}:{}'
+
+
+class MachineDetailCache:
+    """
+    Stores the serialized detail of a machine (issues, solutions, guides, steps
+    and attachments) under a key made of the machine id and a version stamp.
+
+    Invalidating a machine replaces its stamp, so every cached variant of the old
+    content is ignored and expires on its own. Stamps are MachineVersion rows:
+    a change made in any process (another web worker, run_worker) reaches the
+    cache keys of all of them, whatever the cache backend.
+
+    Stamps are maintained even when caching the details is disabled: the views
+    also use them as ETags.
+    """
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'MACHINE_DETAIL_CACHE_ENABLED', False)
+
+    # Current stamp of a machine, or of all machines with ALL_MACHINES; read once per request
+    def version(self, machine_id, request=None):
+        versions = getattr(request, '_machine_versions', None)
+        if versions is None:
+            versions = {}
+            if request is not None:
+                request._machine_versions = versions
+        if machine_id not in versions:
+            versions[machine_id] = self._read_stamp(str(machine_id))
+        return versions[machine_id]
+
+    def _read_stamp(self, key):
+        stamp = MachineVersion.objects.filter(key=key).values_list('stamp', flat=True).first()
+        if stamp is None:
+            # A new random stamp, never one that older entries could still be stored under
+            MachineVersion.objects.bulk_create([MachineVersion(key=key, stamp=uuid.uuid4().hex)], ignore_conflicts=True)
+            stamp = MachineVersion.objects.filter(key=key).values_list('stamp', flat=True).first()
+        return stamp
+
+    def get_or_build(self, machine_id, request, build):
+        """
+        Returns the cached detail of a machine, or calls build() and caches its
+        result. Absolute URLs in the detail depend on the host, which is part of the key.
+        """
+        if not self.enabled:
+            return build()
+
+        key = DETAIL_KEY.format(machine_id, self.version(machine_id, request), request.build_absolute_uri('/'))
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.set(key, data, settings.MACHINE_DETAIL_CACHE_TIMEOUT)
+        return data
+
+    def invalidate(self, *machine_ids):
+        # Runs after the commit, so a concurrent request cannot cache the old rows under the new stamp
+        machine_ids = {machine_id for machine_id in machine_ids if machine_id}
+        if not machine_ids:
+            return
+        machine_ids.add(ALL_MACHINES)
+
+        def bump():
+            MachineVersion.objects.bulk_create(
+                [MachineVersion(key=str(machine_id), stamp=uuid.uuid4().hex) for machine_id in machine_ids],
+                update_conflicts=True, unique_fields=['key'], update_fields=['stamp']
+            )
+        transaction.on_commit(bump)
+
+
+# Machine ids whose detail shows an attached file
+def machine_ids_for_attachment(associated_model, associated_id):
+    if associated_model == 'Machine':
+        return [associated_id]
+    if associated_model == 'Issue':
+        return list(Issue.objects.filter(id=associated_id).values_list('machine_id', flat=True))
+    if associated_model == 'Step':
+        return list(Step.objects.filter(id=associated_id).values_list('guide__solution__issue__machine_id', flat=True))
+    return []
+
+
+# Shared cache helper for this process
+machine_detail_cache = MachineDetailCache()
@@ -0,0 +1,73 @@
+# repairmate_backend/api/management/commands/benchmark_json.py
+# python3 manage.py benchmark_json [--iterations 50]
+
+import json
+import timeit
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from api.models import Machine, Issue, Step, ISSUE_TREE
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import MachineSerializer, IssueSerializer
+from api.snapshots import SnapshotRequest
+from api.utils.attachment_utils import AttachmentResolver
+
+
+class Command(BaseCommand):
+    help = 'Compares the stdlib and orjson JSON renderers and parsers on API payloads (run populate_test_data first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Runs per payload and encoder')
+
+    def build_payloads(self):
+        context = {'request': SnapshotRequest()}
+
+        machines = list(Machine.objects.select_related(
+            'category', 'manufacturer', 'department', 'machine_type'
+        ).prefetch_related('issues', *(f'issues__{relation}' for relation in ISSUE_TREE)))
+        machine_details = MachineSerializer(machines, many=True, context={
+            **context, 'attachments': AttachmentResolver.for_machine_details(machines)
+        }).data
+
+        issues = list(Issue.objects.with_tree())
+        issue_list = IssueSerializer(issues, many=True, context={
+            **context, 'attachments': AttachmentResolver.for_issues(issues)
+        }).data
+
+        return {
+            'machine details': machine_details,
+            'issue list': issue_list,
+            # Raw values: datetime objects and ArrayField lists go through the encoder itself
+            'issue rows (datetimes)': list(Issue.objects.values('id', 'title', 'created_at', 'updated_at')),
+            'step rows (video_urls)': list(Step.objects.values('id', 'description', 'video_urls')),
+        }
+
+    def time(self, func, iterations):
+        return timeit.timeit(func, number=iterations) / iterations * 1000
+
+    def handle(self, *args, **options):
+        if not Machine.objects.exists():
+            raise CommandError('No machines found: run populate_test_data first')
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed (pip install orjson): only the stdlib is measured'))
+
+        iterations = options['iterations']
+        stdlib, fast = JSONRenderer(), FastJSONRenderer()
+
+        self.stdout.write(f"{'payload':<24}{'size':>10}{'stdlib':>10}{'orjson':>10}{'speedup':>9}{'parse':>18}")
+        for name, data in self.build_payloads().items():
+            expected = stdlib.render(data)
+            if fast.render(data) != expected:
+                raise CommandError(f'{name}: the orjson output differs from the stdlib output')
+
+            stdlib_ms = self.time(lambda: stdlib.render(data), iterations)
+            parse_ms = self.time(lambda: json.loads(expected), iterations)
+            line = f"{name:<24}{len(expected) / 1024:>8.1f}KB{stdlib_ms:>8.2f}ms"
+            if orjson is not None:
+                fast_ms = self.time(lambda: fast.render(data), iterations)
+                fast_parse_ms = self.time(lambda: orjson.loads(expected), iterations)
+                line += f"{fast_ms:>8.2f}ms{stdlib_ms / fast_ms:>8.1f}x{parse_ms:>8.2f}/{fast_parse_ms:.2f}ms"
+            else:
+                line += f"{'-':>10}{'-':>9}{parse_ms:>8.2f}ms"
+            self.stdout.write(line)
+
+        self.stdout.write(self.style.SUCCESS('Identical output from both renderers'))
@@ -0,0 +1,53 @@
+# repairmate_backend/api/management/commands/prune_activity_logs.py
+# python3 manage.py prune_activity_logs [--days 90] [--dry-run]
+
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+from api.models import UserActivityLog
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes activity logs older than the retention period. '
+        'They stay counted in UserActivityDailyCount, which is updated as logs are written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ACTIVITY_LOG_RETENTION_DAYS,
+            help='Keep this many days of raw activity logs'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.localdate() - timedelta(days=options['days'])
+        old_logs = UserActivityLog.objects.filter(created_at__lt=day_start(cutoff))
+
+        oldest = old_logs.aggregate(oldest=Min('created_at'))['oldest']
+        if oldest is None:
+            self.stdout.write(self.style.SUCCESS('No activity logs to prune'))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(f'Would delete {old_logs.count()} activity logs older than {cutoff}')
+            return
+
+        # One day per statement keeps locks short on large tables
+        day = timezone.localtime(oldest).date()
+        removed = 0
+        while day < cutoff:
+            deleted, _ = UserActivityLog.objects.filter(
+                created_at__gte=day_start(day),
+                created_at__lt=day_start(day + timedelta(days=1))
+            ).delete()
+            removed += deleted
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} activity logs older than {cutoff}'))
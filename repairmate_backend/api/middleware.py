@@ -0,0 +1,72 @@
+# api/middleware.py
+
+import logging
+import time
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Counts the SQL queries run on the current thread's database connection and
+    the time spent in them, without needing DEBUG:
+
+        with QueryCounter() as queries:
+            ...
+        queries.count, queries.duration (seconds), queries.statements
+    """
+
+    def __init__(self, keep_statements=False):
+        self.keep_statements = keep_statements
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+            if self.keep_statements:
+                self.statements.append(sql)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+
+class QueryCountMiddleware:
+    """
+    Records the number of SQL queries and the database time of every request.
+    Requests above QUERY_COUNT_WARN_THRESHOLD queries are logged as warnings, the
+    others at debug level. With QUERY_COUNT_HEADERS (default: DEBUG) the numbers
+    are also sent back as X-DB-Query-Count / X-DB-Query-Time (milliseconds).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryCounter() as queries:
+            response = self.get_response(request)
+
+        duration_ms = queries.duration * 1000
+        level = logging.WARNING if queries.count > settings.QUERY_COUNT_WARN_THRESHOLD else logging.DEBUG
+        logger.log(
+            level, f"{request.method} {request.path} -> {response.status_code}: "
+                   f"{queries.count} queries, {duration_ms:.1f}ms in the database"
+        )
+
+        if settings.QUERY_COUNT_HEADERS:
+            response['X-DB-Query-Count'] = str(queries.count)
+            response['X-DB-Query-Time'] = f'{duration_ms:.1f}'
+        return response
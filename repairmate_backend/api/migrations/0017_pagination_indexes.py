@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-18 14:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_alter_machinecopy_options_alter_machinecopy_table'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['-created_at', '-id'], name='issue_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['user', '-created_at'], name='activitylog_user_created_idx'),
+        ),
+    ]
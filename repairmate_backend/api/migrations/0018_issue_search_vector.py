@@ -0,0 +1,36 @@
+# Generated by Django 5.1 on 2026-10-18 14:19
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+# Fills the search vector of the issues that already exist
+def populate_search_vector(apps, schema_editor):
+    Issue = apps.get_model('api', 'Issue')
+    Issue.objects.update(search_vector=(
+        SearchVector('title', weight='A', config='english')
+        + SearchVector('keywords', weight='B', config='english')
+        + SearchVector('description', weight='C', config='english')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='issue_search_vector_idx'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1 on 2026-10-18 14:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_activitylog_created_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivityDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('activity_type', models.CharField(choices=[('ISSUE_VIEW', 'Viewed Issue'), ('ISSUE_CREATE', 'Created Issue'), ('ISSUE_UPDATE', 'Updated Issue'), ('MACHINE_VIEW', 'Viewed Machine'), ('MACHINE_CREATE', 'Created Machine'), ('MACHINE_UPDATE', 'Updated Machine'), ('SOLUTION_CREATE', 'Created Solution'), ('SOLUTION_UPDATE', 'Updated Solution'), ('GUIDE_CREATE', 'Created Guide'), ('GUIDE_UPDATE', 'Updated Guide')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['created_at'], name='activitylog_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='useractivitydailycount',
+            name='issue',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.issue'),
+        ),
+        migrations.AddField(
+            model_name='useractivitydailycount',
+            name='machine',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='api.machine'),
+        ),
+        migrations.AddField(
+            model_name='useractivitydailycount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_daily_counts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitydailycount',
+            index=models.Index(fields=['user', '-date'], name='activitycount_user_date_idx'),
+        ),
+    ]
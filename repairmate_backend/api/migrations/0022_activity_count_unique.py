@@ -0,0 +1,37 @@
+# Generated by Django 5.1 on 2026-10-18 14:35
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Counts the activity logs written before the daily counts were maintained on insert.
+# Rows removed by prune_activity_logs were already added to the counts when they were deleted.
+def backfill_daily_counts(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO api_useractivitydailycount (user_id, date, activity_type, machine_id, issue_id, count)
+            SELECT user_id, (created_at AT TIME ZONE %s)::date, activity_type, machine_id, issue_id, COUNT(*)
+            FROM api_useractivitylog
+            GROUP BY 1, 2, 3, 4, 5
+            ON CONFLICT (user_id, date, activity_type, COALESCE(machine_id, 0), COALESCE(issue_id, 0))
+            DO UPDATE SET count = api_useractivitydailycount.count + EXCLUDED.count
+            """,
+            [settings.TIME_ZONE]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_activity_rollup'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='useractivitydailycount',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('date'), models.F('activity_type'), django.db.models.functions.comparison.Coalesce(models.F('machine'), models.Value(0)), django.db.models.functions.comparison.Coalesce(models.F('issue'), models.Value(0)), name='activitycount_unique_key'),
+        ),
+        migrations.RunPython(backfill_daily_counts, migrations.RunPython.noop),
+    ]
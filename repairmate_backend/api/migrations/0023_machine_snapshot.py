@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-18 14:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_activity_count_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineSnapshot',
+            fields=[
+                ('machine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='api.machine')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('built_version', models.PositiveIntegerField(default=0)),
+                ('content', models.TextField(blank=True)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_machine_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineVersion',
+            fields=[
+                ('key', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('stamp', models.CharField(max_length=32)),
+            ],
+        ),
+    ]
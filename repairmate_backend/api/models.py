@@ -1,17 +1,28 @@
 # repairmate_backend/api/models.py
 
 import os
-from django.db import models
+import re
+from collections import defaultdict
+from django.db import models, connection, transaction
 from django.contrib.auth.models import AbstractUser
-from django.db.models import JSONField
+from django.db.models import JSONField, Q, F, Case, When, Value
+from django.db.models.functions import Upper, Greatest, Coalesce
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, SearchVectorField,
+    TrigramSimilarity, TrigramWordSimilarity
+)
 from django.conf import settings
-from file_manager.models import ManagedFile
+from file_manager.services import get_files, get_first_file
 from django.core.exceptions import ValidationError # New
 from django.utils import timezone
 import pytz
 
 
+# Placeholder shown for machines without an uploaded image
+DEFAULT_MACHINE_IMAGE_URL = 'https://img.perceptpixel.com/bibawdef/RepairMate/default_machine.png'
+
 # Defines the different subscription plans that a user or organization can have
 class SubscriptionPlan(models.Model):
     """Defines the different subscription plans available"""
@@ -123,13 +134,21 @@ class CustomUser(AbstractUser):
     # Logs user activity with a helper method
     def log_activity(self, activity_type, description, machine=None, issue=None):
         """Helper method to log user activity"""
-        return UserActivityLog.objects.create(
+        from .activity_buffer import activity_buffer  # The buffer module imports this one
+        entry = UserActivityLog(
             user=self,
             activity_type=activity_type,
             description=description,
             machine=machine,
             issue=issue
         )
+        if activity_buffer.enabled:
+            # Written in batches by the buffer instead of one INSERT per request
+            return activity_buffer.add(entry)
+        with transaction.atomic():
+            entry.save()
+            UserActivityDailyCount.add_logs([entry])
+        return entry
 
 # Stores user preferences like notification settings and language
 class UserPreferences(models.Model):
@@ -180,14 +199,105 @@ class UserActivityLog(models.Model):
     machine = models.ForeignKey('Machine', on_delete=models.SET_NULL, null=True, blank=True)
     issue = models.ForeignKey('Issue', on_delete=models.SET_NULL, null=True, blank=True)
     description = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered batch is written
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Backs the per-user listing and its cursor pagination
+            models.Index(fields=['user', '-created_at'], name='activitylog_user_created_idx'),
+            # Backs the retention scan of old rows (prune_activity_logs)
+            models.Index(fields=['created_at'], name='activitylog_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.activity_type} - {self.created_at}"
 
+# Daily totals of activity logs, updated as logs are written and kept after the raw rows are pruned
+class UserActivityDailyCount(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='activity_daily_counts')
+    date = models.DateField()
+    activity_type = models.CharField(max_length=20, choices=UserActivityLog.ACTIVITY_TYPES)
+    machine = models.ForeignKey('Machine', on_delete=models.SET_NULL, null=True, blank=True)
+    issue = models.ForeignKey('Issue', on_delete=models.SET_NULL, null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', '-date'], name='activitycount_user_date_idx'),
+        ]
+        constraints = [
+            # One row per key; machine and issue are often empty, and NULLs never conflict
+            models.UniqueConstraint(
+                F('user'), F('date'), F('activity_type'),
+                Coalesce(F('machine'), Value(0)), Coalesce(F('issue'), Value(0)),
+                name='activitycount_unique_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.activity_type} - {self.date}: {self.count}"
+
+    @classmethod
+    def add_logs(cls, logs):
+        """
+        Adds saved UserActivityLog entries to the daily counts with one upsert.
+        Call it in the transaction that writes the logs so both stay in step.
+        """
+        totals = defaultdict(int)
+        for log in logs:
+            key = (log.user_id, timezone.localdate(log.created_at), log.activity_type, log.machine_id, log.issue_id)
+            totals[key] += 1
+        if not totals:
+            return
+
+        values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(totals))
+        params = [value for key, count in totals.items() for value in (*key, count)]
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_id, date, activity_type, machine_id, issue_id, count)
+                VALUES {values}
+                ON CONFLICT (user_id, date, activity_type, COALESCE(machine_id, 0), COALESCE(issue_id, 0))
+                DO UPDATE SET count = {table}.count + EXCLUDED.count
+                """,
+                params
+            )
+
+    @classmethod
+    def detach(cls, field, ids):
+        """
+        Folds the counts of machines or issues about to be deleted (field is
+        'machine' or 'issue') into the rows without one. Left to SET_NULL, two
+        counts of one day (e.g. views of two issues of a machine) would end up
+        with the same key and the DELETE would fail. Called from pre_delete.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        column = cls._meta.get_field(field).column
+        machine = 'NULL' if column == 'machine_id' else 'machine_id'
+        issue = 'NULL' if column == 'issue_id' else 'issue_id'
+        kept = 'issue_id' if column == 'machine_id' else 'machine_id'
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_id, date, activity_type, machine_id, issue_id, count)
+                SELECT user_id, date, activity_type, {machine}, {issue}, SUM(count)
+                FROM {table}
+                WHERE {column} = ANY(%s)
+                GROUP BY user_id, date, activity_type, {kept}
+                ON CONFLICT (user_id, date, activity_type, COALESCE(machine_id, 0), COALESCE(issue_id, 0))
+                DO UPDATE SET count = {table}.count + EXCLUDED.count
+                """,
+                [ids]
+            )
+            cursor.execute(f"DELETE FROM {table} WHERE {column} = ANY(%s)", [ids])
+
 # Stores notes with optional reminders for a user
 class UserNote(models.Model):
     PRIORITY_CHOICES = [
@@ -319,29 +429,158 @@ class Machine(models.Model):
 
     # Returns the image URL for the machine
     def get_image_url(self):
-        image = ManagedFile.objects.filter(associated_model='Machine', associated_id=self.id, file_type='IMAGE').first()
-        return image.file.url if image else 'https://img.perceptpixel.com/bibawdef/RepairMate/default_machine.png'
+        image = get_first_file('Machine', self.id, 'IMAGE')
+        return image.file.url if image else DEFAULT_MACHINE_IMAGE_URL
 
     @property
     def images(self):
-        return ManagedFile.objects.filter(associated_model='Machine', associated_id=self.id, file_type='IMAGE')
+        return get_files('Machine', self.id, 'IMAGE')
     
     # Returns the URL for the machine's manual
     def get_manual_url(self):
-        manual = ManagedFile.objects.filter(
-            associated_model='Machine',
-            associated_id=self.id,
-            file_type='MANUAL'
-        ).first()
+        manual = get_first_file('Machine', self.id, 'MANUAL')
         return manual.file.url if manual else None
 
     @property
     def manual(self):
-        return ManagedFile.objects.filter(
-            associated_model='Machine',
-            associated_id=self.id,
-            file_type='MANUAL'
-        ).first()
+        return get_first_file('Machine', self.id, 'MANUAL')
+
+
+# Pre-rendered JSON of a machine detail, served by optimized_machine_detail while it is current.
+# version is bumped whenever the machine tree changes; the worker then renders it again (api/snapshots.py).
+class MachineSnapshot(models.Model):
+    machine = models.OneToOneField(Machine, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    version = models.PositiveIntegerField(default=1)
+    built_version = models.PositiveIntegerField(default=0)  # Version the content was rendered from (0: never)
+    content = models.TextField(blank=True)
+    built_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Snapshot of machine {self.machine_id} (v{self.built_version}/{self.version})"
+
+    @property
+    def is_current(self):
+        return self.built_version == self.version
+
+
+# Version stamp of the content of a machine, or of all machines (key 'all'), replaced on every change.
+# Kept in the database so all processes (web workers, run_worker) see a change at once (api/machine_cache.py).
+class MachineVersion(models.Model):
+    key = models.CharField(max_length=20, primary_key=True)
+    stamp = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.key}: {self.stamp}"
+
+
+# Text search configuration and weights used for issue matching (title > keywords > description)
+ISSUE_SEARCH_CONFIG = 'english'
+ISSUE_SEARCH_VECTOR = (
+    SearchVector('title', weight='A', config=ISSUE_SEARCH_CONFIG)
+    + SearchVector('keywords', weight='B', config=ISSUE_SEARCH_CONFIG)
+    + SearchVector('description', weight='C', config=ISSUE_SEARCH_CONFIG)
+)
+# Added to the rank when a word of the query is exactly the issue's error code
+ERROR_CODE_RANK_BOOST = 1.0
+
+
+# Fuzzy (trigram) matching only considers words at least this long, and at most this many of them
+FUZZY_MIN_TERM_LENGTH = 4
+FUZZY_MAX_TERMS = 10
+# Minimum similarity for a fuzzy hit: word similarity against the title, similarity against the error code
+FUZZY_TITLE_THRESHOLD = 0.6
+FUZZY_ERROR_CODE_THRESHOLD = 0.5
+
+
+# Splits free text into search terms; leading dashes are dropped so websearch syntax can't negate terms
+def tokenize_search_text(text):
+    return [term for term in re.findall(r'\w[\w-]*', (text or '').lower()) if len(term) > 1]
+
+
+# Words that look like error codes contain at least one digit (e.g. HAAS-001)
+def is_error_code_term(term):
+    return any(char.isdigit() for char in term)
+
+
+# Highest of several similarity expressions, 0 when there are none or all are NULL
+def best_similarity(scores):
+    if not scores:
+        return Value(0.0, output_field=models.FloatField())
+    best = scores[0] if len(scores) == 1 else Greatest(*scores)
+    return Coalesce(best, Value(0.0), output_field=models.FloatField())
+
+
+# Relations serialized with every issue (solutions, their guide and its steps)
+ISSUE_TREE = ('solutions', 'solutions__guide', 'solutions__guide__steps')
+
+
+class IssueQuerySet(models.QuerySet):
+    # Prefetches the solutions, guides and steps serialized with the issues
+    def with_tree(self):
+        return self.prefetch_related(*ISSUE_TREE)
+
+    # Recomputes the stored search vector for every issue in the queryset
+    def update_search_vector(self):
+        return self.update(search_vector=ISSUE_SEARCH_VECTOR)
+
+    # Ranked full-text search over title, keywords and description, with an exact error code boost
+    def search(self, text, limit=20):
+        terms = tokenize_search_text(text)
+        if not terms:
+            return self.none()
+
+        # Any term may match; the english configuration drops stop words and stems the rest
+        query = SearchQuery(' or '.join(terms), search_type='websearch', config=ISSUE_SEARCH_CONFIG)
+        error_codes = [term.upper() for term in terms]
+
+        return self.annotate(
+            error_code_upper=Upper('error_code')
+        ).filter(
+            Q(search_vector=query) | Q(error_code_upper__in=error_codes)
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query) + Case(
+                When(error_code_upper__in=error_codes, then=Value(ERROR_CODE_RANK_BOOST)),
+                default=Value(0.0),
+                output_field=models.FloatField()
+            )
+        ).order_by('-rank', '-id')[:limit]
+
+    # Typo-tolerant search on title and error code backed by the pg_trgm GIN indexes
+    def fuzzy_search(self, text, limit=20):
+        terms = tokenize_search_text(text)
+        error_codes = [term for term in terms if is_error_code_term(term)][:FUZZY_MAX_TERMS]
+        words = [
+            term for term in terms
+            if not is_error_code_term(term) and len(term) >= FUZZY_MIN_TERM_LENGTH
+        ][:FUZZY_MAX_TERMS]
+        if not error_codes and not words:
+            return self.none()
+
+        # The trigram operators (%, <%) let PostgreSQL use the GIN indexes to find candidates
+        candidates = Q()
+        for code in error_codes:
+            candidates |= Q(error_code__trigram_similar=code)
+        for word in words:
+            candidates |= Q(title__trigram_word_similar=word)
+
+        # Each side is scored by its closest word; one close word is enough for a hit
+        return self.filter(candidates).annotate(
+            code_similarity=best_similarity([TrigramSimilarity('error_code', code) for code in error_codes]),
+            title_similarity=best_similarity([TrigramWordSimilarity(word, 'title') for word in words])
+        ).filter(
+            Q(code_similarity__gte=FUZZY_ERROR_CODE_THRESHOLD) |
+            Q(title_similarity__gte=FUZZY_TITLE_THRESHOLD)
+        ).annotate(
+            similarity=Greatest('code_similarity', 'title_similarity')
+        ).order_by('-similarity', '-id')[:limit]
+
+    # Ranked full-text matches first, then trigram matches for typos until the limit is reached
+    def match(self, text, limit=20):
+        matches = list(self.search(text, limit=limit))
+        if len(matches) < limit:
+            seen = [issue.id for issue in matches]
+            matches += list(self.exclude(id__in=seen).fuzzy_search(text, limit=limit - len(matches)))
+        return matches
 
 
 # Represents an issue associated with a machine, including description and error code
@@ -354,18 +593,37 @@ class Issue(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Weighted tsvector of title, keywords and description, kept in sync on save
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = IssueQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Backs the cursor pagination of the all-issues listing
+            models.Index(fields=['-created_at', '-id'], name='issue_created_id_idx'),
+            GinIndex(fields=['search_vector'], name='issue_search_vector_idx'),
+            # Trigram indexes for typo-tolerant matching
+            GinIndex(fields=['title'], name='issue_title_trgm_idx', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['error_code'], name='issue_error_code_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return f"{self.machine.name} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The vector is computed by the database from the saved columns
+        Issue.objects.filter(pk=self.pk).update_search_vector()
+
     # Returns the image URL associated with the issue
     def get_image_url(self):
-        image = ManagedFile.objects.filter(associated_model='Issue', associated_id=self.id, file_type='IMAGE').first()
+        image = get_first_file('Issue', self.id, 'IMAGE')
         return image.file.url if image else None
 
     @property
     def images(self):
-        return ManagedFile.objects.filter(associated_model='Issue', associated_id=self.id, file_type='IMAGE')
+        return get_files('Issue', self.id, 'IMAGE')
 
 
 # Represents a solution for a specific issue
@@ -417,12 +675,12 @@ class Step(models.Model):
 
     # Returns a list of image URLs associated with the step
     def get_image_urls(self):
-        images = ManagedFile.objects.filter(associated_model='Step', associated_id=self.id, file_type='IMAGE')
+        images = get_files('Step', self.id, 'IMAGE')
         return [image.file.url for image in images]
 
     @property
     def images(self):
-        return ManagedFile.objects.filter(associated_model='Step', associated_id=self.id, file_type='IMAGE')
+        return get_files('Step', self.id, 'IMAGE')
 
 
 # Represents a training workspace where users can upload and manage documents
@@ -0,0 +1,36 @@
+# api/pagination.py
+# Keyset (cursor) pagination classes for the list endpoints
+
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Cursor pagination that is only applied when the client asks for it by
+    sending `cursor` or `page_size`. Requests without those parameters keep
+    receiving a plain list, which is what the dashboard expects today.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+# Machines are ordered by primary key (Machine.Meta.ordering)
+class MachineCursorPagination(OptionalCursorPagination):
+    ordering = '-id'
+
+
+# Issues are paginated by creation date, with the id as tie-breaker
+class IssueCursorPagination(OptionalCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+# Activity logs are paginated by creation date, with the id as tie-breaker
+class ActivityLogCursorPagination(OptionalCursorPagination):
+    ordering = ('-created_at', '-id')
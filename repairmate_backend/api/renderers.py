@@ -0,0 +1,42 @@
+# api/renderers.py
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pip install orjson
+    orjson = None
+
+# orjson leaves dates and times to the DRF encoder so they are written exactly as before
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed, falling back to
+    the stdlib encoder for what orjson cannot write the same way: indented
+    output (?indent / browsable API), non-compact or ASCII-only settings, and
+    values orjson rejects (e.g. integers above 64 bits).
+
+    The bodies match JSONRenderer's for strings, integers, dates, lists and
+    dicts, which is all the API sends. Floats do not always match: orjson
+    writes exponents differently (1e16 for 1e+16, 1.5e-7 for 1.5e-07), and it
+    writes NaN and infinities as null where JSONRenderer raises under
+    STRICT_JSON. Views that return such floats should use JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same as JSONRenderer: keep the output a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
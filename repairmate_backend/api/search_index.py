@@ -0,0 +1,199 @@
+# api/search_index.py
+# Optional in-process inverted index used by match_issues instead of the database search
+
+import math
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import Issue, tokenize_search_text
+
+# Terms that carry no meaning for matching symptoms
+STOP_WORDS = frozenset("""
+    a an and are as at be but by can do does for from has have how i in is it its
+    me my no not of on or our so that the their then there this to was we were
+    what when where which while will with you your
+""".split())
+
+# Each occurrence of a term counts this many times depending on the field (error code, title > keywords > description)
+FIELD_WEIGHTS = (('error_code', 3), ('title', 3), ('keywords', 2), ('description', 1))
+INDEXED_FIELDS = ('id', 'machine_id') + tuple(field for field, _ in FIELD_WEIGHTS)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Re-read issues updated slightly before the last sync, in case their transaction committed late
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def index_terms(text):
+    return [term for term in tokenize_search_text(text) if term not in STOP_WORDS]
+
+
+# Approximate memory footprint of nested dicts/lists/sets of plain values
+def deep_sizeof(obj, seen=None):
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+class IssueSearchIndex:
+    """
+    Inverted index of issue terms (machine -> term -> issue -> weighted frequency)
+    scored with BM25.
+
+    The index is built on first use, kept up to date in this process through the
+    Issue post_save/post_delete signals, and resynchronised from the database every
+    ISSUE_SEARCH_INDEX_SYNC_INTERVAL seconds so changes made by other workers (or by
+    bulk writes, which send no signals) are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(lambda: defaultdict(dict))
+        self._documents = {}  # issue id -> (machine id, document length, terms)
+        self._machine_lengths = defaultdict(int)  # machine id -> total document length
+        self._machine_counts = defaultdict(int)  # machine id -> number of documents
+        self._built = False
+        self._synced_at = None
+        self._last_sync_check = 0.0
+        self.build_seconds = None
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'ISSUE_SEARCH_INDEX_ENABLED', False)
+
+    # Rebuilds the whole index from the database
+    def build(self):
+        started = time.perf_counter()
+        synced_at = timezone.now()
+        issues = Issue.objects.values(*INDEXED_FIELDS)
+        with self._lock:
+            self._reset()
+            for issue in issues.iterator(chunk_size=2000):
+                self._add(issue)
+            self._built = True
+            self._synced_at = synced_at
+            self._last_sync_check = time.monotonic()
+            self.build_seconds = time.perf_counter() - started
+
+    def _add(self, issue):
+        terms = defaultdict(int)
+        for field, weight in FIELD_WEIGHTS:
+            for term in index_terms(issue[field]):
+                terms[term] += weight
+
+        machine_id = issue['machine_id']
+        length = sum(terms.values())
+        for term, frequency in terms.items():
+            self._postings[machine_id][term][issue['id']] = frequency
+        self._documents[issue['id']] = (machine_id, length, tuple(terms))
+        self._machine_lengths[machine_id] += length
+        self._machine_counts[machine_id] += 1
+
+    def _remove(self, issue_id):
+        document = self._documents.pop(issue_id, None)
+        if document is None:
+            return
+        machine_id, length, terms = document
+        machine_postings = self._postings[machine_id]
+        for term in terms:
+            machine_postings[term].pop(issue_id, None)
+            if not machine_postings[term]:
+                del machine_postings[term]
+        self._machine_lengths[machine_id] -= length
+        self._machine_counts[machine_id] -= 1
+
+    # Adds or replaces one issue (model instance)
+    def update_issue(self, issue):
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(issue.id)
+            self._add({field: getattr(issue, field) for field in INDEXED_FIELDS})
+
+    def remove_issue(self, issue_id):
+        with self._lock:
+            if self._built:
+                self._remove(issue_id)
+
+    # Picks up issues changed or deleted outside this process since the last sync
+    def sync(self):
+        synced_at = timezone.now()
+        changed = Issue.objects.filter(
+            updated_at__gte=self._synced_at - SYNC_OVERLAP
+        ).values(*INDEXED_FIELDS)
+        existing_ids = set(Issue.objects.values_list('id', flat=True))
+        with self._lock:
+            for issue in changed:
+                self._remove(issue['id'])
+                self._add(issue)
+            for issue_id in set(self._documents) - existing_ids:
+                self._remove(issue_id)
+            self._synced_at = synced_at
+            self._last_sync_check = time.monotonic()
+
+    def _ensure_current(self):
+        with self._lock:
+            if not self._built:
+                self.build()
+                return
+            interval = getattr(settings, 'ISSUE_SEARCH_INDEX_SYNC_INTERVAL', 30)
+            if time.monotonic() - self._last_sync_check >= interval:
+                self.sync()
+
+    # Returns [(issue id, score)] for one machine, best first
+    def search(self, machine_id, text, limit=20):
+        self._ensure_current()
+        terms = set(index_terms(text))
+
+        with self._lock:
+            machine_postings = self._postings.get(machine_id)
+            document_count = self._machine_counts.get(machine_id, 0)
+            if not machine_postings or not document_count:
+                return []
+            average_length = self._machine_lengths[machine_id] / document_count
+
+            scores = defaultdict(float)
+            for term in terms:
+                postings = machine_postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for issue_id, frequency in postings.items():
+                    length = self._documents[issue_id][1]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[issue_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'built': self._built,
+                'issues': len(self._documents),
+                'terms': sum(len(postings) for postings in self._postings.values()),
+                'memory_bytes': deep_sizeof(self._postings) + deep_sizeof(self._documents),
+                'build_seconds': self.build_seconds,
+                'synced_at': self._synced_at,
+            }
+
+
+# Shared index for this process
+issue_index = IssueSearchIndex()
@@ -7,10 +7,12 @@ from .models import (
     Machine, TroubleshootingGuide, Manufacturer, EquipmentCategory,Department,
     MachineType, Issue, Solution, CustomUser, Step, SubscriptionPlan, Organization,
     UserPreferences, UserActivityLog, UserNote, TrainingWorkspace, TrainingDocument,
-    MachineCopy
+    MachineCopy, DEFAULT_MACHINE_IMAGE_URL
 )
-from file_manager.services import get_files
+from file_manager.services import get_files, get_first_file
+from file_manager.derivatives import image_srcset
 from file_manager.models import ManagedFile
+from task_queue.models import Job
 
 logger = logging.getLogger(__name__)
 
@@ -233,6 +235,15 @@ class MachineTypeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
+# Files attached to an object, from the batched resolver (context['attachments']) when it loaded them
+def attached_files(context, associated_model, associated_id, file_type=None):
+    attachments = context.get('attachments')
+    files = attachments.get_files(associated_model, associated_id, file_type) if attachments is not None else None
+    if files is None:
+        files = get_files(associated_model, associated_id, file_type)
+    return files
+
+
 # Serializer for managed files
 class ManagedFileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -249,8 +260,8 @@ class StepSerializer(serializers.ModelSerializer):
 
     # Method to get associated images for a step
     def get_images(self, obj):
-        files = ManagedFile.objects.filter(associated_model='Step', associated_id=obj.id)
-        return [{'id': f.id, 'url': f.file.url} for f in files]
+        files = attached_files(self.context, 'Step', obj.id)
+        return [{'id': f.id, 'url': f.file.url, 'srcset': image_srcset(f)} for f in files]
 
 # Serializer for troubleshooting guides, including steps
 class TroubleshootingGuideSerializer(serializers.ModelSerializer):
@@ -316,16 +327,6 @@ class SolutionSerializer(serializers.ModelSerializer):
         except Issue.DoesNotExist:
             raise serializers.ValidationError({'error': 'Issue not found'})
 
-    # Custom to_representation method to include the guide
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        if hasattr(instance, 'guide') and instance.guide is not None:
-            representation['guide'] = TroubleshootingGuideSerializer(
-                instance.guide,
-                context=self.context
-            ).data
-        return representation
-
     def get_guide(self, obj):
         if hasattr(obj, 'guide') and obj.guide is not None:
             return TroubleshootingGuideSerializer(obj.guide, context=self.context).data
@@ -363,8 +364,12 @@ class IssueSerializer(serializers.ModelSerializer):
     # Method to get associated images
     def get_images(self, obj):
         request = self.context.get('request')
-        files = ManagedFile.objects.filter(associated_model='Issue', associated_id=obj.id)
-        return [{'id': f.id, 'url': request.build_absolute_uri(f.file.url)} for f in files]
+        files = attached_files(self.context, 'Issue', obj.id)
+        return [
+            {'id': f.id, 'url': request.build_absolute_uri(f.file.url),
+             'srcset': image_srcset(f, request.build_absolute_uri)}
+            for f in files
+        ]
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -425,14 +430,25 @@ class MachineSerializer(serializers.ModelSerializer):
                   'machine_type', 'machine_type_name', 'issues', 'images', 'manual_url',
                   'is_template', 'is_copy', 'original_template_id']
 
+    # Returns the MachineCopy row for the machine, using the batched resolver when present
+    def _get_machine_copy(self, obj):
+        attachments = self.context.get('attachments')
+        if attachments is not None and attachments.is_copy_loaded(obj.id):
+            return attachments.get_copy(obj.id)
+        return MachineCopy.objects.filter(machine=obj).first()
+
+    # Returns the files attached to the machine, using the batched resolver when present
+    def _get_machine_files(self, obj, file_type=None):
+        return attached_files(self.context, 'Machine', obj.id, file_type)
+
     # Method to check if the machine is a copy
     def get_is_copy(self, obj):
-        return MachineCopy.objects.filter(machine=obj).exists()
+        return self._get_machine_copy(obj) is not None
 
     # Method to get the original template ID if the machine is a copy
     def get_original_template_id(self, obj):
-        copy = MachineCopy.objects.filter(machine=obj).first()
-        return copy.original_template.id if copy else None
+        copy = self._get_machine_copy(obj)
+        return copy.original_template_id if copy else None
 
     # Method to get associated issues
     def get_issues(self, obj):
@@ -441,12 +457,16 @@ class MachineSerializer(serializers.ModelSerializer):
 
     def get_images(self, obj):
         request = self.context.get('request')
-        files = ManagedFile.objects.filter(associated_model='Machine', associated_id=obj.id)
-        return [{'id': f.id, 'url': request.build_absolute_uri(f.file.url)} for f in files]
+        files = self._get_machine_files(obj)
+        return [
+            {'id': f.id, 'url': request.build_absolute_uri(f.file.url),
+             'srcset': image_srcset(f, request.build_absolute_uri)}
+            for f in files
+        ]
 
     # Check this later***
     def get_image_url(self, obj): # new to debug el fetch de imagenes
-        image = ManagedFile.objects.filter(associated_model='Machine', associated_id=obj.id).first()
+        image = get_first_file('Machine', obj.id)
         if image:
             return image.file.url
         return None
@@ -457,11 +477,8 @@ class MachineSerializer(serializers.ModelSerializer):
         if not request:
             return None
             
-        manual = ManagedFile.objects.filter(
-            associated_model='Machine',
-            associated_id=obj.id,
-            file_type='MANUAL'
-        ).first()
+        manuals = self._get_machine_files(obj, file_type='MANUAL')
+        manual = manuals[0] if manuals else None
         
         if manual:
             return request.build_absolute_uri(manual.file.url)
@@ -532,6 +549,39 @@ class MachineSerializer(serializers.ModelSerializer):
 
         return super().update(instance, validated_data)
     
+# Compact machine representation for list endpoints: no issue tree, only counts and a cover image
+class MachineListSerializer(MachineSerializer):
+    issues = None
+    images = None
+    image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    issue_count = serializers.IntegerField(read_only=True)
+    solution_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Machine
+        fields = ['id', 'name', 'model', 'series', 'description', 'category', 'category_name',
+                  'manufacturer', 'manufacturer_name', 'department', 'department_name',
+                  'machine_type', 'machine_type_name', 'image_url', 'image_srcset', 'manual_url',
+                  'issue_count', 'solution_count', 'is_template', 'is_copy', 'original_template_id']
+
+    # Method to get the cover image URL (first uploaded image)
+    def get_image_url(self, obj):
+        request = self.context.get('request')
+        images = self._get_machine_files(obj, file_type='IMAGE')
+        if not images:
+            return DEFAULT_MACHINE_IMAGE_URL
+        url = images[0].file.url
+        return request.build_absolute_uri(url) if request else url
+
+    # Method to get the resized versions of the cover image ({mime type: srcset})
+    def get_image_srcset(self, obj):
+        request = self.context.get('request')
+        images = self._get_machine_files(obj, file_type='IMAGE')
+        if not images:
+            return {}
+        return image_srcset(images[0], request.build_absolute_uri if request else None)
+
 # Serializer for training documents
 class TrainingDocumentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -548,3 +598,11 @@ class TrainingWorkspaceSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'created_by', 'created_at', 
                  'updated_at', 'is_public', 'documents']
         read_only_fields = ['created_by', 'created_at', 'updated_at']
+
+# Serializer for background job status (template copies, emails...)
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'task', 'status', 'result', 'attempts', 'max_attempts',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -0,0 +1,105 @@
+# api/signals.py
+# Signal receivers registered by ApiConfig.ready()
+
+from django.db import transaction
+from django.db.models.signals import pre_delete, post_save, post_delete
+from django.dispatch import receiver
+from file_manager.derivatives import derivatives_generated
+from file_manager.models import ManagedFile
+from .models import (
+    Machine, MachineCopy, Issue, Solution, TroubleshootingGuide, Step,
+    Manufacturer, EquipmentCategory, Department, MachineType, UserActivityDailyCount
+)
+from .machine_cache import machine_detail_cache, machine_ids_for_attachment
+from . import snapshots
+from .search_index import issue_index
+
+
+# Fold the daily activity counts of deleted machines and issues before SET_NULL clears their keys
+@receiver(pre_delete, sender=Machine)
+def detach_machine_activity_counts(sender, instance, **kwargs):
+    UserActivityDailyCount.detach('machine', [instance.id])
+
+
+@receiver(pre_delete, sender=Issue)
+def detach_issue_activity_counts(sender, instance, **kwargs):
+    UserActivityDailyCount.detach('issue', [instance.id])
+
+
+# Keep the in-process issue index in step with saved and deleted issues, once the change is committed
+# (sync() would never undo a rolled back change: it only reads rows whose updated_at moved)
+@receiver(post_save, sender=Issue)
+def index_saved_issue(sender, instance, **kwargs):
+    if issue_index.enabled:
+        transaction.on_commit(lambda: issue_index.update_issue(instance))
+
+
+@receiver(post_delete, sender=Issue)
+def unindex_deleted_issue(sender, instance, **kwargs):
+    if issue_index.enabled:
+        issue_id = instance.id
+        transaction.on_commit(lambda: issue_index.remove_issue(issue_id))
+
+
+# Every stored form of these machines' details (cache entries, ETags, snapshots) is out of date
+def machines_changed(*machine_ids):
+    machine_ids = [machine_id for machine_id in machine_ids if machine_id]
+    machine_detail_cache.invalidate(*machine_ids)
+    snapshots.mark_changed(*machine_ids)
+
+
+# Drop the cached detail of the machine showing a changed row
+@receiver([post_save, post_delete], sender=Machine)
+def invalidate_machine(sender, instance, **kwargs):
+    machines_changed(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Issue)
+@receiver([post_save, post_delete], sender=MachineCopy)
+def invalidate_issue_machine(sender, instance, **kwargs):
+    machines_changed(instance.machine_id)
+
+
+@receiver([post_save, post_delete], sender=Solution)
+def invalidate_solution_machine(sender, instance, **kwargs):
+    machines_changed(*Issue.objects.filter(id=instance.issue_id).values_list('machine_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=TroubleshootingGuide)
+def invalidate_guide_machine(sender, instance, **kwargs):
+    machines_changed(
+        *Issue.objects.filter(solutions__id=instance.solution_id).values_list('machine_id', flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=Step)
+def invalidate_step_machine(sender, instance, **kwargs):
+    machines_changed(
+        *Issue.objects.filter(solutions__guide__id=instance.guide_id).values_list('machine_id', flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=ManagedFile)
+def invalidate_attachment_machine(sender, instance, **kwargs):
+    machines_changed(*machine_ids_for_attachment(instance.associated_model, instance.associated_id))
+
+
+# Names of lookup rows are shown in the details of the machines using them
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=EquipmentCategory)
+@receiver(post_save, sender=Department)
+@receiver(post_save, sender=MachineType)
+def invalidate_lookup_machines(sender, instance, created, **kwargs):
+    if not created:
+        field = {Manufacturer: 'manufacturer', EquipmentCategory: 'category',
+                 Department: 'department', MachineType: 'machine_type'}[sender]
+        machines_changed(*Machine.objects.filter(**{field: instance}).values_list('id', flat=True))
+
+
+# New srcsets for every file sharing the blob
+@receiver(derivatives_generated)
+def invalidate_blob_machines(sender, blob, **kwargs):
+    machine_ids = []
+    for associated_model, associated_id in blob.managed_files.values_list('associated_model', 'associated_id'):
+        machine_ids.extend(machine_ids_for_attachment(associated_model, associated_id))
+    machines_changed(*machine_ids)
@@ -0,0 +1,123 @@
+# api/snapshots.py
+# Materialized machine details: the JSON of optimized_machine_detail rendered once per change by the worker
+
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from task_queue.queue import enqueue
+from .models import Machine, MachineSnapshot
+from .renderers import FastJSONRenderer
+from .serializers import MachineSerializer
+from .utils.attachment_utils import prefetch_machine_detail
+
+# Stands for scheme and host in stored absolute URLs; replaced with those of each request
+BASE_PLACEHOLDER = 'repairmate-snapshot://base'
+
+
+class SnapshotRequest:
+    # Request stand-in for rendering without a client: relative URLs are made absolute against the placeholder
+    def build_absolute_uri(self, location='/'):
+        if urlsplit(location).scheme:
+            return location
+        return BASE_PLACEHOLDER + location
+
+
+def snapshots_enabled():
+    return getattr(settings, 'MACHINE_SNAPSHOTS_ENABLED', False)
+
+
+def render_machine_detail(machine_id):
+    machine = Machine.objects.select_related(
+        'category', 'manufacturer', 'department', 'machine_type'
+    ).get(id=machine_id)
+    attachments = prefetch_machine_detail(machine)
+    data = MachineSerializer(machine, context={'request': SnapshotRequest(), 'attachments': attachments}).data
+    return FastJSONRenderer().render(data).decode('utf-8')
+
+
+def rebuild_snapshot(machine_id):
+    """
+    Renders the snapshot of a machine if it is out of date. The content is only
+    stored if the machine did not change while it was rendered; otherwise the
+    job queued by that change renders it again. Returns the stored version, or
+    None when there was nothing to do.
+    """
+    snapshot = MachineSnapshot.objects.filter(machine_id=machine_id).first()
+    if snapshot is None or snapshot.is_current:
+        return None
+
+    version = snapshot.version
+    content = render_machine_detail(machine_id)
+    stored = MachineSnapshot.objects.filter(machine_id=machine_id, version=version).update(
+        content=content, built_version=version, built_at=timezone.now()
+    )
+    return version if stored else None
+
+
+def schedule_rebuild(machine_id):
+    from .tasks import rebuild_machine_snapshot_task  # tasks.py imports this module
+    # Immediate mode only runs jobs that are due when the request commits: no delay there
+    delay = 0 if settings.TASK_QUEUE_IMMEDIATE else settings.MACHINE_SNAPSHOT_REBUILD_DELAY
+    return enqueue(rebuild_machine_snapshot_task, args=[machine_id], delay=delay)
+
+
+def current_snapshot(request, machine_id):
+    """
+    Returns the snapshot JSON of a machine with the URLs of this request, or None
+    when there is no current one. The first read of a machine queues its snapshot.
+    """
+    content = MachineSnapshot.objects.filter(
+        machine_id=machine_id, built_version=F('version')
+    ).values_list('content', flat=True).first()
+    if content is not None:
+        return content.replace(BASE_PLACEHOLDER, request.build_absolute_uri('/').rstrip('/'))
+
+    _, created = MachineSnapshot.objects.get_or_create(machine_id=machine_id)
+    if created:
+        transaction.on_commit(lambda: schedule_rebuild(machine_id))
+    return None
+
+
+class OutdateSnapshots:
+    """
+    on_commit callback outdating the snapshots of the machines changed in one
+    transaction and queueing one rendering per machine. Saving a guide fires a
+    signal per step; they all add their machine to the same callback.
+    """
+
+    def __init__(self, machine_ids):
+        self.machine_ids = set(machine_ids)
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        changed = list(MachineSnapshot.objects.filter(machine_id__in=self.machine_ids).values_list('machine_id', flat=True))
+        if not changed:
+            return
+        MachineSnapshot.objects.filter(machine_id__in=changed).update(version=F('version') + 1)
+        if snapshots_enabled():
+            for machine_id in changed:
+                schedule_rebuild(machine_id)
+
+
+def mark_changed(*machine_ids):
+    # After the commit: outdate the snapshots of these machines and queue their rendering.
+    # Snapshots are outdated even while disabled, so none built before is served once they are enabled again.
+    machine_ids = {machine_id for machine_id in machine_ids if machine_id}
+    if not machine_ids:
+        return
+
+    # The callback already registered at this savepoint level and not run yet (dropped with it on rollback).
+    # atomic(savepoint=False) blocks add None: they cannot roll back on their own, so they do not count
+    connection = transaction.get_connection()
+    savepoint_ids = set(connection.savepoint_ids) - {None}
+    outdate = next((
+        func for sids, func, _ in connection.run_on_commit
+        if isinstance(func, OutdateSnapshots) and sids - {None} == savepoint_ids and not func.done
+    ), None)
+    if outdate is not None:
+        outdate.machine_ids.update(machine_ids)
+    else:
+        transaction.on_commit(OutdateSnapshots(machine_ids))
@@ -0,0 +1,62 @@
+# api/streaming.py
+# Streamed list responses (?stream=json or ?stream=ndjson) for exports of whole tables
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from .renderers import FastJSONRenderer
+
+STREAM_PARAM = 'stream'
+STREAM_FORMATS = {
+    'json': 'application/json',      # One JSON array, same body as the plain list
+    'ndjson': 'application/x-ndjson',  # One JSON object per line
+}
+# Rows fetched, prefetched and serialized together; memory use depends on this, not on the table size
+BATCH_SIZE = 200
+
+
+def requested_stream_format(request):
+    # The format asked for with ?stream=, None for a regular response
+    stream_format = request.query_params.get(STREAM_PARAM)
+    if stream_format is None:
+        return None
+    if stream_format not in STREAM_FORMATS:
+        raise ValidationError({STREAM_PARAM: f"Use one of: {', '.join(STREAM_FORMATS)}"})
+    return stream_format
+
+
+def iter_batches(queryset, batch_size=BATCH_SIZE):
+    # Server-side cursor; prefetch_related lookups run once per batch
+    batch = []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_list(queryset, serialize_batch, stream_format, batch_size=BATCH_SIZE):
+    """
+    Returns a StreamingHttpResponse that reads the queryset in batches and
+    writes each one as soon as it is serialized. serialize_batch(objects)
+    returns the representations of one batch (e.g. a ListSerializer's data), so
+    per-batch helpers such as AttachmentResolver keep the query count per batch fixed.
+    """
+    renderer = FastJSONRenderer()
+
+    def chunks():
+        first = True
+        if stream_format == 'json':
+            yield b'['
+        for batch in iter_batches(queryset, batch_size):
+            rendered = [renderer.render(item) for item in serialize_batch(batch)]
+            if stream_format == 'ndjson':
+                yield b''.join(item + b'\n' for item in rendered)
+            elif rendered:
+                yield (b'' if first else b',') + b','.join(rendered)
+                first = False
+        if stream_format == 'json':
+            yield b']'
+
+    return StreamingHttpResponse(chunks(), content_type=STREAM_FORMATS[stream_format])
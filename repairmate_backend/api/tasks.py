@@ -0,0 +1,39 @@
+# api/tasks.py
+# Background tasks run by the task_queue worker
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from task_queue.queue import task
+from .models import Machine, MachineCopy
+from .snapshots import rebuild_snapshot
+from .utils.copy_utils import copy_machine_template
+from .utils.email_utils import send_welcome_email
+
+
+@task(max_attempts=5, backoff=60)
+def send_welcome_email_task(user_email, username):
+    # send_welcome_email logs and returns None on failure; raise so the job is retried
+    if send_welcome_email(user_email, username) is None:
+        raise RuntimeError(f"Welcome email to {user_email} was not sent")
+    return {'sent_to': user_email}
+
+
+@task(max_attempts=3, backoff=30)
+def copy_machine_template_task(template_id, user_id):
+    user = get_user_model().objects.get(pk=user_id)
+    with transaction.atomic():
+        # Locking the template makes concurrent jobs copying it wait, so they see each other's copy
+        template = Machine.objects.select_for_update().get(pk=template_id, is_template=True)
+        # A retry, or a second request queued meanwhile, must not create a second copy
+        existing_copy = MachineCopy.objects.filter(user=user, original_template_id=template_id).first()
+        if existing_copy:
+            return {'machine_id': existing_copy.machine_id}
+
+        new_machine = copy_machine_template(template, user)
+    return {'machine_id': new_machine.id}
+
+
+@task(max_attempts=3, backoff=30)
+def rebuild_machine_snapshot_task(machine_id):
+    # Several changes in a row queue several jobs; the first renders, the others find the snapshot current
+    return {'machine_id': machine_id, 'version': rebuild_snapshot(machine_id)}
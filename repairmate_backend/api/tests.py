@@ -1,3 +1,286 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from .activity_buffer import ActivityLogBuffer
+from .flat_serializers import serialize_issues, serialize_solutions
+from .machine_cache import machine_detail_cache, ALL_MACHINES
+from .middleware import QueryCounter
+from .models import (
+    CustomUser, Machine, MachineSnapshot, MachineVersion, Issue, Solution, TroubleshootingGuide, Step,
+    UserActivityLog, UserActivityDailyCount
+)
+from .serializers import IssueSerializer, SolutionSerializer, TroubleshootingGuideSerializer
+from .snapshots import rebuild_snapshot
+from .tasks import rebuild_machine_snapshot_task
+from task_queue.models import Job
 
-# Create your tests here.
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    ACTIVITY_LOG_BUFFER_ENABLED=False,
+    MACHINE_DETAIL_CACHE_ENABLED=False,
+    MACHINE_SNAPSHOTS_ENABLED=False,
+    ISSUE_SEARCH_INDEX_ENABLED=False,
+    QUERY_COUNT_HEADERS=True,
+)
+class QueryBudgetTests(TestCase):
+    """
+    Upper bounds on the SQL queries of the most used endpoints, on the data of
+    populate_test_data. A SerializerMethodField running one query per row pushes
+    an endpoint over its budget; the failure lists the statements that ran.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('populate_test_data', stdout=StringIO())
+        cls.user = CustomUser.objects.get(username='testuser')
+        # The template with the largest tree
+        cls.machine = Machine.objects.filter(is_template=True).annotate(
+            issue_count=Count('issues')
+        ).order_by('-issue_count', 'id').first()
+        # Stamps exist once a machine has been read; budgets are for that steady state
+        for machine_id in [*Machine.objects.values_list('id', flat=True), ALL_MACHINES]:
+            machine_detail_cache.version(machine_id)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertQueryBudget(self, budget, method, url, **kwargs):
+        with QueryCounter(keep_statements=True) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+        self.assertLessEqual(
+            queries.count, budget,
+            f"{method.upper()} {url} ran {queries.count} queries (budget {budget}):\n" + '\n'.join(queries.statements)
+        )
+        return response
+
+    def test_machine_list(self):
+        self.assertQueryBudget(3, 'get', '/api/machines/')
+
+    def test_machine_retrieve(self):
+        self.assertQueryBudget(14, 'get', f'/api/machines/{self.machine.id}/')
+
+    def test_optimized_machine_detail(self):
+        self.assertQueryBudget(14, 'get', f'/api/machines/{self.machine.id}/detail/')
+
+    def test_machine_issues(self):
+        self.assertQueryBudget(8, 'get', f'/api/machines/{self.machine.id}/issues/')
+
+    def test_issue_solutions(self):
+        issue = Issue.objects.filter(machine=self.machine).first()
+        self.assertQueryBudget(5, 'get', f'/api/issues/{issue.id}/solutions/')
+
+    def test_lookup_lists(self):
+        for url in ('/api/manufacturers/', '/api/categories/', '/api/departments/', '/api/machine-types/'):
+            self.assertQueryBudget(1, 'get', url)
+
+    def test_issue_list(self):
+        self.assertQueryBudget(7, 'get', '/api/issues/')
+
+    def test_match_issues(self):
+        self.assertQueryBudget(7, 'post', '/api/match-issues/', data={
+            'description': 'machine does not power on', 'machine_id': self.machine.id
+        }, format='json')
+
+    def test_machine_detail_queries_do_not_grow_with_the_tree(self):
+        url = f'/api/machines/{self.machine.id}/detail/'
+        with QueryCounter() as before:
+            self.client.get(url)
+
+        issue = Issue.objects.create(machine=self.machine, title='Spindle noise', description='Grinding noise')
+        solution = Solution.objects.create(issue=issue, description='Replace the bearings')
+        guide = TroubleshootingGuide.objects.create(solution=solution, title='Bearing replacement')
+        Step.objects.bulk_create([Step(guide=guide, step_number=n, description=f'Step {n}') for n in range(1, 31)])
+
+        with QueryCounter() as after:
+            self.client.get(url)
+        self.assertEqual(after.count, before.count)
+
+    @override_settings(MACHINE_SNAPSHOTS_ENABLED=True)
+    def test_machine_detail_snapshot(self):
+        url = f'/api/machines/{self.machine.id}/detail/'
+        with self.captureOnCommitCallbacks(execute=True):
+            built = self.client.get(url).json()
+        self.assertEqual(rebuild_snapshot(self.machine.id), 1)
+
+        # Served from the snapshot, with the same body
+        response = self.assertQueryBudget(7, 'get', url)
+        self.assertEqual(response.json(), built)
+
+        # A change outdates the snapshot at once, before the worker renders it again
+        step = Step.objects.filter(guide__solution__issue__machine=self.machine).first()
+        step.description = 'Check the fuse first'
+        with self.captureOnCommitCallbacks(execute=True):
+            step.save()
+        self.assertFalse(MachineSnapshot.objects.get(machine=self.machine).is_current)
+        self.assertIn('Check the fuse first', self.client.get(url).content.decode())
+
+        self.assertEqual(rebuild_snapshot(self.machine.id), 2)
+        self.assertIn('Check the fuse first', MachineSnapshot.objects.get(machine=self.machine).content)
+
+    def test_flat_serializers_match_the_model_serializers(self):
+        request = self.client.get('/api/machines/').wsgi_request
+        # Every seeded solution has a guide
+        guideless = Solution.objects.create(issue=Issue.objects.filter(machine=self.machine).first(), description='Reset the breaker')
+        issues = Issue.objects.filter(machine=self.machine)
+        self.assertEqual(
+            serialize_issues(issues, {'request': request}),
+            IssueSerializer(issues, many=True, context={'request': request}).data
+        )
+        solutions = Solution.objects.filter(issue__machine=self.machine)
+        self.assertEqual(serialize_solutions(solutions, {}), SolutionSerializer(solutions, many=True).data)
+        # DRF sends null for the missing guide rather than leaving the key out
+        data = next(data for data in serialize_solutions(solutions, {}) if data['id'] == guideless.id)
+        self.assertIsNone(data['guide'])
+
+    def test_streamed_lists(self):
+        for url in ('/api/machines/', '/api/issues/'):
+            expected = self.client.get(url).content
+            response = self.client.get(url, {'stream': 'json'})
+            self.assertEqual(b''.join(response.streaming_content), expected)
+
+            response = self.client.get(url, {'stream': 'ndjson'})
+            lines = b''.join(response.streaming_content).splitlines()
+            self.assertEqual([json.loads(line) for line in lines], json.loads(expected))
+
+        self.assertEqual(self.client.get('/api/issues/', {'stream': 'xml'}).status_code, 400)
+
+    def test_etag_changes_with_a_change_from_another_process(self):
+        url = f'/api/machines/{self.machine.id}/issues/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # What the signals of another process (e.g. run_worker) leave behind: only the stored stamp changes
+        MachineVersion.objects.filter(key=str(self.machine.id)).update(stamp='changed-elsewhere')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_machine_snapshot_outdated_while_disabled(self):
+        url = f'/api/machines/{self.machine.id}/detail/'
+        with self.settings(MACHINE_SNAPSHOTS_ENABLED=True), self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+        rebuild_snapshot(self.machine.id)
+
+        # Snapshots are off in this class: the change still outdates the stored one
+        step = Step.objects.filter(guide__solution__issue__machine=self.machine).first()
+        step.description = 'Check the fuse first'
+        with self.captureOnCommitCallbacks(execute=True):
+            step.save()
+        self.assertFalse(MachineSnapshot.objects.get(machine=self.machine).is_current)
+
+        with self.settings(MACHINE_SNAPSHOTS_ENABLED=True):
+            self.assertIn('Check the fuse first', self.client.get(url).content.decode())
+
+    @override_settings(MACHINE_SNAPSHOTS_ENABLED=True)
+    def test_machine_snapshot_one_rebuild_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/api/machines/{self.machine.id}/detail/')
+        guide = TroubleshootingGuide.objects.filter(solution__issue__machine=self.machine).first()
+        jobs = Job.objects.filter(task=rebuild_machine_snapshot_task.task_name)
+        queued = jobs.count()
+
+        # Saving a guide deletes and recreates all its steps: one signal per row
+        steps = [{'step_number': n, 'description': f'Step {n}'} for n in range(1, 11)]
+        serializer = TroubleshootingGuideSerializer(guide, data={'steps': steps}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                serializer.save()
+
+        self.assertEqual(jobs.count(), queued + 1)
+        self.assertEqual(MachineSnapshot.objects.get(machine=self.machine).version, 2)
+
+    @override_settings(MACHINE_SNAPSHOTS_ENABLED=True, TASK_QUEUE_IMMEDIATE=True, MACHINE_SNAPSHOT_REBUILD_DELAY=30)
+    def test_machine_snapshot_immediate_mode(self):
+        # Without a worker, the rebuild jobs run in the request process right after the commit
+        url = f'/api/machines/{self.machine.id}/detail/'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url)
+        self.assertTrue(MachineSnapshot.objects.get(machine=self.machine).is_current)
+
+        step = Step.objects.filter(guide__solution__issue__machine=self.machine).first()
+        step.description = 'Check the fuse first'
+        with self.captureOnCommitCallbacks(execute=True):
+            step.save()
+        snapshot = MachineSnapshot.objects.get(machine=self.machine)
+        self.assertTrue(snapshot.is_current)
+        self.assertIn('Check the fuse first', snapshot.content)
+
+    def test_query_count_headers(self):
+        response = self.assertQueryBudget(3, 'get', '/api/machines/')
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+        self.assertIn('X-DB-Query-Time', response)
+
+
+@override_settings(ACTIVITY_LOG_BUFFER_ENABLED=False, MACHINE_SNAPSHOTS_ENABLED=False, ISSUE_SEARCH_INDEX_ENABLED=False)
+class ActivityCountTests(TestCase):
+    """
+    Daily activity counts of deleted machines and issues are kept, folded into
+    the rows without a machine or issue.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='counter', email='counter@example.com', password='pass12345')
+        self.machine = Machine.objects.create(name='Press', model='P-1', owner=self.user)
+        self.issues = [Issue.objects.create(machine=self.machine, title=f'Issue {n}', description='-') for n in (1, 2)]
+
+    def test_delete_machine_with_two_issue_views_on_one_day(self):
+        self.user.log_activity('MACHINE_VIEW', 'Viewed', machine=self.machine)
+        for issue in self.issues:
+            self.user.log_activity('ISSUE_VIEW', 'Viewed', machine=self.machine, issue=issue)
+
+        self.machine.delete()
+
+        counts = UserActivityDailyCount.objects.filter(user=self.user)
+        self.assertEqual(
+            {(row.activity_type, row.machine_id, row.issue_id, row.count) for row in counts},
+            {('MACHINE_VIEW', None, None, 1), ('ISSUE_VIEW', None, None, 2)}
+        )
+
+    def test_delete_issues_one_by_one(self):
+        for issue in self.issues:
+            self.user.log_activity('ISSUE_VIEW', 'Viewed', machine=self.machine, issue=issue)
+
+        for issue in self.issues:
+            issue.delete()
+
+        counts = UserActivityDailyCount.objects.filter(user=self.user)
+        self.assertEqual(
+            {(row.activity_type, row.machine_id, row.issue_id, row.count) for row in counts},
+            {('ISSUE_VIEW', self.machine.id, None, 2)}
+        )
+
+
+@override_settings(ACTIVITY_LOG_BUFFER_ENABLED=True, ACTIVITY_LOG_DEDUPE_WINDOW=0, ACTIVITY_LOG_BUFFER_SIZE=100,
+                   MACHINE_SNAPSHOTS_ENABLED=False, ISSUE_SEARCH_INDEX_ENABLED=False)
+class ActivityBufferTests(TransactionTestCase):
+    # Foreign keys are only checked at commit, which TestCase never reaches
+
+    def test_flush_after_the_machine_was_deleted(self):
+        user = CustomUser.objects.create_user(username='buffered', email='buffered@example.com', password='pass12345')
+        machine = Machine.objects.create(name='Lathe', model='L-1', owner=user)
+        buffer = ActivityLogBuffer()
+        buffer.add(UserActivityLog(user=user, activity_type='MACHINE_VIEW', description='Viewed', machine=machine))
+        buffer.add(UserActivityLog(user=user, activity_type='MACHINE_CREATE', description='Created'))
+        Machine.objects.filter(pk=machine.pk).delete()  # In another request, as in production
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(buffer.pending(), 0)
+        self.assertEqual(UserActivityLog.objects.filter(user=user, machine__isnull=True).count(), 2)
+        buffer.shutdown()
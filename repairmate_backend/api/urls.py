@@ -6,11 +6,11 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     register_user, user_profile, CustomAuthToken, MachineViewSet, ManufacturerViewSet,
     EquipmentCategoryViewSet, DepartmentViewSet, MachineTypeViewSet, machine_issues,
-    match_issues, AllIssuesView, issue_detail, create_issue, solution_operations, 
+    match_issues, issue_index_stats, AllIssuesView, issue_detail, create_issue, solution_operations, 
     IssueViewSet, StepViewSet, SubscriptionPlanViewSet, OrganizationViewSet,
     UserPreferencesViewSet, UserActivityLogViewSet, UserNoteViewSet, TrainingWorkspaceViewSet,
     serve_image, upload_step_image, upload_machine_manual, get_machine_manual, delete_machine_manual,
-    optimized_machine_detail, get_step_images, create_guide
+    optimized_machine_detail, get_step_images, create_guide, job_status, activity_stats
 )
 
 from django.urls import path
@@ -44,9 +44,11 @@ urlpatterns = [
     path('api-token-auth/', CustomAuthToken.as_view(), name='api_token_auth'), # Token authentication
     path('register/', register_user, name='register'),
     path('user/profile/', user_profile, name='user_profile'),
+    path('activity-stats/', activity_stats, name='activity_stats'), # Dashboard cards
 
     # Routes for issue matching and troubleshooting
     path('match-issues/', match_issues, name='match_issues'),
+    path('match-issues/index/', issue_index_stats, name='issue_index_stats'),
     path('machines/<int:machine_id>/issues/', machine_issues, name='machine_issues'), # for TroubleshootDetails.js
     path('machines/<int:machine_id>/issues/', create_issue, name='create_issue'), # Do not change this (important to edit and save)
     path('issues/<int:issue_id>/', issue_detail, name='issue_detail'), # Important to retrieve the detail issue (PageIssue.js)
@@ -78,4 +80,7 @@ urlpatterns = [
     path('machines/<int:machine_id>/manual/', views.get_machine_manual, name='get_manual'),
     path('machines/<int:machine_id>/manual/delete/', views.delete_machine_manual, name='delete_manual'),
 
+    # Status of background jobs (async template copies)
+    path('jobs/<int:job_id>/', job_status, name='job_status'),
+
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
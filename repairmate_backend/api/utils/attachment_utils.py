@@ -0,0 +1,95 @@
+# api/utils/attachment_utils.py
+from django.db.models import prefetch_related_objects
+from file_manager.services import get_files_for_many
+from ..models import MachineCopy, ISSUE_TREE
+
+
+class AttachmentResolver:
+    """
+    Batch loader for the ManagedFile and MachineCopy rows of a page of objects.
+
+    Serializers look the resolver up in their context and read from it instead of
+    querying per row. Anything that was not loaded returns None so the caller
+    can fall back to its own query.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._loaded_files = set()
+        self._copies = {}
+        self._loaded_copies = set()
+
+    @classmethod
+    def for_machines(cls, machines):
+        # One ManagedFile query and one MachineCopy query for the whole page
+        resolver = cls()
+        machine_ids = [machine.id for machine in machines]
+        resolver.load_files('Machine', machine_ids)
+        resolver.load_copies(machine_ids)
+        return resolver
+
+    @classmethod
+    def for_issues(cls, issues):
+        # One ManagedFile query for the issues and one for the steps of their guides (prefetched with ISSUE_TREE)
+        resolver = cls()
+        resolver.load_issue_trees(issues)
+        return resolver
+
+    @classmethod
+    def for_machine_details(cls, machines):
+        # Everything a machine detail shows; the issues must be prefetched with their trees
+        resolver = cls.for_machines(machines)
+        resolver.load_issue_trees([issue for machine in machines for issue in machine.issues.all()])
+        return resolver
+
+    def load_issue_trees(self, issues):
+        issue_ids = []
+        step_ids = []
+        for issue in issues:
+            issue_ids.append(issue.id)
+            for solution in issue.solutions.all():
+                guide = getattr(solution, 'guide', None)  # None when the solution has no guide
+                if guide is not None:
+                    step_ids.extend(step.id for step in guide.steps.all())
+        self.load_files('Issue', issue_ids)
+        self.load_files('Step', step_ids)
+
+    def load_files(self, associated_model, ids):
+        ids = [obj_id for obj_id in ids if (associated_model, obj_id) not in self._loaded_files]
+        if not ids:
+            return
+
+        for obj_id, files in get_files_for_many(associated_model, ids).items():
+            self._files[(associated_model, obj_id)] = files
+        self._loaded_files.update((associated_model, obj_id) for obj_id in ids)
+
+    def load_copies(self, machine_ids):
+        machine_ids = [machine_id for machine_id in machine_ids if machine_id not in self._loaded_copies]
+        if not machine_ids:
+            return
+
+        for copy in MachineCopy.objects.filter(machine_id__in=machine_ids).order_by('id'):
+            self._copies.setdefault(copy.machine_id, copy)
+        self._loaded_copies.update(machine_ids)
+
+    # Returns the files of one object, or None if they were never loaded
+    def get_files(self, associated_model, associated_id, file_type=None):
+        if (associated_model, associated_id) not in self._loaded_files:
+            return None
+        files = self._files.get((associated_model, associated_id), [])
+        if file_type:
+            files = [f for f in files if f.file_type == file_type]
+        return files
+
+    def is_copy_loaded(self, machine_id):
+        return machine_id in self._loaded_copies
+
+    # Returns the MachineCopy row for a machine (None if it is not a copy)
+    def get_copy(self, machine_id):
+        return self._copies.get(machine_id)
+
+
+# Loads everything the machine detail shows in a fixed number of queries; returns the attachment resolver
+def prefetch_machine_detail(machine):
+    prefetch_related_objects([machine], 'issues', *(f'issues__{relation}' for relation in ISSUE_TREE))
+    return AttachmentResolver.for_machine_details([machine])
@@ -0,0 +1,124 @@
+# api/utils/copy_utils.py
+from collections import Counter
+from django.db import transaction
+from file_manager.models import ManagedFile, FileBlob
+from file_manager.services import get_files_for_many
+from ..models import Machine, MachineCopy, Issue, Solution, TroubleshootingGuide, Step
+from ..search_index import issue_index
+
+
+# Copies the ManagedFile rows of the given objects to their copies, sharing the stored file
+def _copy_file_references(associated_model, id_map):
+    if not id_map:
+        return []
+    return [
+        ManagedFile(
+            file=managed_file.file.name,
+            blob_id=managed_file.blob_id,
+            original_name=managed_file.original_name,
+            file_type=managed_file.file_type,
+            associated_model=associated_model,
+            associated_id=id_map[associated_id]
+        )
+        for associated_id, files in get_files_for_many(associated_model, id_map).items()
+        for managed_file in files
+    ]
+
+
+@transaction.atomic
+def copy_machine_template(template, user):
+    """
+    Creates a copy of a template machine for the user, including its issues,
+    solutions, guides, steps and attached files.
+
+    Each level of the tree is inserted with a single bulk_create and the new ids
+    are mapped back onto the next level. Attached files are not duplicated: the
+    copies reference the same blob as the template.
+    """
+    new_machine = Machine.objects.create(
+        name=template.name,
+        model=template.model,
+        series=template.series,
+        description=template.description,
+        category=template.category,
+        manufacturer=template.manufacturer,
+        department=template.department,
+        machine_type=template.machine_type,
+        owner=user,
+        is_template=False
+    )
+
+    # Register the new copy in the MachineCopy table
+    MachineCopy.objects.create(
+        original_template=template,
+        user=user,
+        machine=new_machine
+    )
+
+    issues = list(Issue.objects.filter(machine=template).order_by('id'))
+    new_issues = Issue.objects.bulk_create([
+        Issue(
+            machine=new_machine,
+            title=issue.title,
+            description=issue.description,
+            error_code=issue.error_code,
+            keywords=issue.keywords,
+            created_by=user
+        )
+        for issue in issues
+    ])
+    issue_map = {issue.id: new_issue.id for issue, new_issue in zip(issues, new_issues)}
+
+    solutions = list(Solution.objects.filter(issue_id__in=list(issue_map)).order_by('id'))
+    new_solutions = Solution.objects.bulk_create([
+        Solution(
+            issue_id=issue_map[solution.issue_id],
+            description=solution.description,
+            created_by=user
+        )
+        for solution in solutions
+    ])
+    solution_map = {solution.id: new_solution.id for solution, new_solution in zip(solutions, new_solutions)}
+
+    guides = list(TroubleshootingGuide.objects.filter(solution_id__in=list(solution_map)).order_by('id'))
+    new_guides = TroubleshootingGuide.objects.bulk_create([
+        TroubleshootingGuide(
+            solution_id=solution_map[guide.solution_id],
+            title=guide.title,
+            created_by=user
+        )
+        for guide in guides
+    ])
+    guide_map = {guide.id: new_guide.id for guide, new_guide in zip(guides, new_guides)}
+
+    steps = list(Step.objects.filter(guide_id__in=list(guide_map)).order_by('id'))
+    new_steps = Step.objects.bulk_create([
+        Step(
+            guide_id=guide_map[step.guide_id],
+            step_number=step.step_number,
+            description=step.description,
+            video_urls=step.video_urls
+        )
+        for step in steps
+    ])
+    step_map = {step.id: new_step.id for step, new_step in zip(steps, new_steps)}
+
+    # Images and manuals: one query per level, one insert for all of them
+    new_files = ManagedFile.objects.bulk_create(
+        _copy_file_references('Machine', {template.id: new_machine.id})
+        + _copy_file_references('Issue', issue_map)
+        + _copy_file_references('Step', step_map)
+    )
+    # Each copied row is one more reference to its blob
+    for blob_id, count in Counter(f.blob_id for f in new_files if f.blob_id).items():
+        FileBlob.add_references(blob_id, count)
+
+    # bulk_create skips Issue.save() and the post_save signal
+    Issue.objects.filter(machine=new_machine).update_search_vector()
+    if issue_index.enabled:
+        def index_new_issues():
+            for issue in new_issues:
+                issue_index.update_issue(issue)
+        transaction.on_commit(index_new_issues)
+
+    return new_machine
@@ -1,29 +1,137 @@
 # api/utils/email_utils.py
-import requests
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
+from django.utils.module_loading import import_string
 from decouple import config
 
 logger = logging.getLogger(__name__)
 
+
+class EmailError(Exception):
+    # Raised by transports when a message could not be sent
+    def __init__(self, message, status_code=None, response_text=''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response_text = response_text
+
+
+class EmailitTransport:
+    """
+    Sends messages through the Emailit HTTP API.
+
+    One instance is shared per process (see get_email_transport), so its
+    requests.Session keeps TLS connections alive between messages. Messages are
+    dicts in the API format: {'from', 'to', 'subject', 'html'}.
+    """
+
+    def __init__(self, api_key=None, api_url=None, timeout=None, pool_size=None):
+        # Obtener API key directamente de .env como respaldo
+        self.api_key = api_key or settings.EMAILIT_API_KEY or config('EMAILIT_API_KEY', default='')
+        self.api_url = api_url or settings.EMAILIT_API_URL
+        self.timeout = timeout or (settings.EMAILIT_CONNECT_TIMEOUT, settings.EMAILIT_READ_TIMEOUT)
+        self.pool_size = pool_size or settings.EMAILIT_POOL_SIZE
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        })
+        # Only failed connections are retried here: nothing was sent yet, so no duplicates
+        retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.3)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retries)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, message):
+        # Returns the API response (dict); raises EmailError on failure
+        if not self.api_key:
+            raise EmailError("API key not found")
+
+        try:
+            response = self.session.post(self.api_url, json=message, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise EmailError(f"Request to Emailit failed: {e}") from e
+
+        if response.status_code >= 400:
+            raise EmailError(
+                f"Emailit answered {response.status_code}",
+                status_code=response.status_code,
+                response_text=response.text
+            )
+        return response.json()
+
+    def send_batch(self, messages):
+        """
+        Sends many messages concurrently over the pooled connections. Returns one
+        entry per message, in order: the API response, or the EmailError raised.
+        """
+        if not messages:
+            return []
+
+        def send_one(message):
+            try:
+                return self.send(message)
+            except EmailError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(messages))) as executor:
+            return list(executor.map(send_one, messages))
+
+
+class LocmemTransport:
+    # Keeps messages in memory instead of sending them (tests and local development)
+    outbox = []
+
+    def send(self, message):
+        self.outbox.append(message)
+        return {'id': f'locmem-{len(self.outbox)}', 'to': message.get('to')}
+
+    def send_batch(self, messages):
+        return [self.send(message) for message in messages]
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_email_transport():
+    # Shared transport of the class named by EMAIL_TRANSPORT
+    global _transport
+    with _transport_lock:
+        transport_class = import_string(settings.EMAIL_TRANSPORT)
+        if not isinstance(_transport, transport_class):
+            _transport = transport_class()
+        return _transport
+
+
+def build_email(to, subject, html):
+    return {
+        'from': settings.EMAILIT_FROM_EMAIL,
+        'to': to,
+        'subject': subject,
+        'html': html
+    }
+
+
+def send_emails(messages):
+    # Bulk notifications (reminders, team invites...): one call, pooled connections
+    results = get_email_transport().send_batch(messages)
+    for message, result in zip(messages, results):
+        if isinstance(result, EmailError):
+            logger.error(f"Error sending email to {message.get('to')}: {result}")
+    return results
+
+
 def send_welcome_email(user_email, username):
     """
     Send a welcome email to newly registered users.
     """
     try:
-        # Obtener API key directamente de .env como respaldo
-        api_key = settings.EMAILIT_API_KEY or config('EMAILIT_API_KEY', default='')
-        
-        if not api_key:
-            logger.error("API key not found")
-            return None
-
-        url = 'https://api.emailit.com/v1/emails'
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
-        
         html_body = f"""
         <html>
             <body>
@@ -41,30 +149,23 @@ def send_welcome_email(user_email, username):
             </body>
         </html>
         """
-        
-        data = {
-            'from': settings.EMAILIT_FROM_EMAIL,
-            'to': user_email,
-            'subject': 'Welcome to RepairMate!',
-            'html': html_body
-        }
-
-        # Get API key directly from .env as a fallback
+
+        data = build_email(user_email, 'Welcome to RepairMate!', html_body)
+
         logger.debug(f"Sending email to {user_email}")
-        logger.debug(f"Using API key: {api_key[:8]}...")
-        
-        response = requests.post(url, json=data, headers=headers)
-        
-        if response.status_code == 401:
-            logger.error(f"Authentication failed. Status code: {response.status_code}")
-            logger.error(f"Response: {response.text}")
-            return None
-            
-        response.raise_for_status()
-        
+
+        result = get_email_transport().send(data)
+
         logger.info(f"Welcome email sent successfully to {user_email}")
-        return response.json()
-        
+        return result
+
+    except EmailError as e:
+        if e.status_code == 401:
+            logger.error(f"Authentication failed. Status code: {e.status_code}")
+            logger.error(f"Response: {e.response_text}")
+        else:
+            logger.error(f"Error sending welcome email to {user_email}: {str(e)}")
+        return None
     except Exception as e:
         logger.exception(f"Error sending welcome email to {user_email}: {str(e)}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,41 @@
+# api/utils/etag_utils.py
+# ETags for API responses, computed from the machine version stamps (MachineVersion rows, shared by all
+# processes) without serializing anything
+
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control
+from ..machine_cache import machine_detail_cache, ALL_MACHINES
+
+
+def machine_etag(request, machine_id, *parts):
+    """
+    ETag of a response built from the content of one machine (ALL_MACHINES for
+    content spanning machines). parts tells responses of the same machine apart
+    (endpoint, query parameters...). Host and format are included because
+    bodies contain absolute URLs and depend on the renderer.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = ':'.join(str(part) for part in (
+        machine_id, machine_detail_cache.version(machine_id, request), request.build_absolute_uri('/'),
+        renderer.format if renderer else '', *parts
+    ))
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def all_machines_etag(request, *parts):
+    return machine_etag(request, ALL_MACHINES, *parts)
+
+
+def not_modified(request, etag):
+    # 304 response when the client already has this version (If-None-Match), else None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_etag(response, etag)
+    return response
+
+
+def set_etag(response, etag):
+    # Clients keep the body but revalidate it on every use; private because responses depend on the user
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
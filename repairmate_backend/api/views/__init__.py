@@ -7,7 +7,7 @@ from .auth_views import CustomAuthToken, register_user
 from .user_views import (
     user_profile, UserPreferencesViewSet, UserActivityLogViewSet, 
     UserNoteViewSet, CustomUserViewSet, SubscriptionPlanViewSet,
-    OrganizationViewSet
+    OrganizationViewSet, activity_stats
 )
 
 # Machine related views
@@ -19,7 +19,7 @@ from .machine_views import (
 
 # Issue related views
 from .issue_views import (
-    IssueViewSet, AllIssuesView, match_issues,
+    IssueViewSet, AllIssuesView, match_issues, issue_index_stats,
     machine_issues, create_issue, issue_detail
 )
 
@@ -32,5 +32,8 @@ from .solution_views import (
 # File related views
 from .file_views import serve_image
 
+# Background job views
+from .job_views import job_status
+
 # Training related views
 from .training_views import TrainingWorkspaceViewSet
@@ -8,7 +8,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework import status
 from django.conf import settings
-from ..utils.email_utils import send_welcome_email
+from task_queue.queue import enqueue
+from ..tasks import send_welcome_email_task
 from ..serializers import UserSerializer
 
 logger = logging.getLogger(__name__)
@@ -35,11 +36,9 @@ def register_user(request):
             user = serializer.save()  # Save the user
             token, created = Token.objects.get_or_create(user=user)
             
-            # Send a welcome email if email sending is enabled
+            # Queue a welcome email if email sending is enabled (sent and retried by the worker)
             if settings.SEND_EMAILS:
-                email_result = send_welcome_email(user.email, user.username)
-                if email_result is None:
-                    logger.warning(f"Failed to send welcome email to {user.email}")
+                enqueue(send_welcome_email_task, args=[user.email, user.username], user=user)
             
             return Response({
                 'token': token.key,
@@ -1,17 +1,20 @@
 # repairmate_backend/api/views/file_views.py
 
 import os
-import mimetypes
-from django.http import FileResponse
 from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.utils._os import safe_join
+from file_manager.delivery import serve_path
 
 def serve_image(request, image_name):
     """
-    Serves an image file from the file system with proper content type detection.
+    Serves an image file from the file system with proper content type detection,
+    byte ranges and conditional requests.
     """
-    image_path = os.path.join(settings.MEDIA_ROOT, 'managed_files', image_name)
-    # Detect content type based on file extension
-    content_type, _ = mimetypes.guess_type(image_path)
-    if not content_type:
-        content_type = 'application/octet-stream'
-    return FileResponse(open(image_path, 'rb'), content_type=content_type)
+    try:
+        image_path = safe_join(os.path.join(settings.MEDIA_ROOT, 'managed_files'), image_name)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    # Content type is detected from the file extension
+    return serve_path(request, image_path)
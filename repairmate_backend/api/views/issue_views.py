@@ -1,25 +1,61 @@
 # repairmate_backend/api/views/issue_views.py
 
-from django.db.models import Q
+from django.db.models import prefetch_related_objects
 from rest_framework import viewsets, permissions, status, generics
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated
-from ..models import Issue, Machine
+from ..models import Issue, Machine, ISSUE_TREE, tokenize_search_text
 from ..serializers import IssueSerializer
-from file_manager.services import save_file, get_files, delete_file
+from ..flat_serializers import serialize_issues
+from ..pagination import IssueCursorPagination
+from ..search_index import issue_index
+from ..streaming import requested_stream_format, stream_list
+from ..utils.attachment_utils import AttachmentResolver
+from ..utils.etag_utils import machine_etag, all_machines_etag, not_modified, set_etag
+from file_manager.services import FileTooLarge, save_file, get_files, delete_file
 from file_manager.models import ManagedFile
 
+# Maximum number of ranked issues returned by match_issues
+MATCH_ISSUES_LIMIT = 20
+
 class IssueViewSet(viewsets.ModelViewSet):
     queryset = Issue.objects.all()
     serializer_class = IssueSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IssueCursorPagination
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({"request": self.request})
         return context
 
+    # Issues of every machine: unchanged while no machine changed
+    def list(self, request, *args, **kwargs):
+        etag = all_machines_etag(request, 'issues', request.query_params.urlencode())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        def serialize(issues):
+            # Images of the issues and of their guide steps in two queries
+            context = self.get_serializer_context()
+            context['attachments'] = AttachmentResolver.for_issues(issues)
+            return self.get_serializer(issues, many=True, context=context).data
+
+        queryset = self.filter_queryset(self.get_queryset()).with_tree()
+
+        # Exports: ?stream=json|ndjson writes the issues batch by batch instead of building the whole list
+        stream_format = requested_stream_format(request)
+        if stream_format:
+            return set_etag(stream_list(queryset, serialize, stream_format), etag)
+
+        page = self.paginate_queryset(queryset)
+        data = serialize(list(page if page is not None else queryset))
+        if page is not None:
+            return set_etag(self.get_paginated_response(data), etag)
+        return set_etag(Response(data), etag)
+
     @action(detail=True, methods=['POST'])
     def upload_image(self, request, pk=None):
         issue = self.get_object()
@@ -27,7 +63,10 @@ class IssueViewSet(viewsets.ModelViewSet):
         if not file:
             return Response({'error': 'No file provided'}, status=400)
         
-        managed_file = save_file(file, 'IMAGE', 'Issue', issue.id)
+        try:
+            managed_file = save_file(file, 'IMAGE', 'Issue', issue.id)
+        except FileTooLarge as e:
+            return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
         return Response({'message': 'File uploaded successfully', 'file_id': managed_file.id})
 
     @action(detail=True, methods=['GET'])
@@ -63,7 +102,14 @@ class IssueViewSet(viewsets.ModelViewSet):
             issue=instance,
             machine=instance.machine
         )
-        return super().retrieve(request, *args, **kwargs)
+        etag = machine_etag(request, instance.machine_id, 'issue', instance.id)
+        response = not_modified(request, etag)
+        if response is None:
+            prefetch_related_objects([instance], *ISSUE_TREE)
+            context = self.get_serializer_context()
+            context['attachments'] = AttachmentResolver.for_issues([instance])
+            response = Response(self.get_serializer(instance, context=context).data)
+        return set_etag(response, etag)
 
     def perform_create(self, serializer):
         instance = serializer.save(created_by=self.request.user)
@@ -78,9 +124,15 @@ class AllIssuesView(generics.ListAPIView):
     queryset = Issue.objects.all()
     serializer_class = IssueSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = IssueCursorPagination
 
     def list(self, request):
         queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -89,23 +141,47 @@ class AllIssuesView(generics.ListAPIView):
 def match_issues(request):
     description = request.data.get('description', '')
     machine_id = request.data.get('machine_id')
-    
-    keywords = description.lower().split()
-    
-    query = Q()
-    for keyword in keywords:
-        query |= Q(keywords__icontains=keyword) | Q(title__icontains=keyword) | Q(description__icontains=keyword)
-    
-    matching_issues = Issue.objects.filter(machine_id=machine_id).filter(query).distinct()
+
+    issues = Issue.objects.filter(machine_id=machine_id).with_tree()
+
+    if tokenize_search_text(description) and issue_index.enabled:
+        # BM25 ranking from the in-process index, then load the ranked issues in one query
+        ranked_ids = [issue_id for issue_id, _ in issue_index.search(
+            int(machine_id) if machine_id else None, description, limit=MATCH_ISSUES_LIMIT
+        )]
+        issues_by_id = issues.in_bulk(ranked_ids)
+        matching_issues = [issues_by_id[issue_id] for issue_id in ranked_ids if issue_id in issues_by_id]
+    elif tokenize_search_text(description):
+        # Ranked full-text search, topped up with trigram matches for misspelled words and codes
+        matching_issues = issues.match(description, limit=MATCH_ISSUES_LIMIT)
+    else:
+        # Without search terms every issue of the machine matches, as before
+        matching_issues = list(issues)
     
     # Added request to prevent issues
-    serializer = IssueSerializer(matching_issues, many=True, context={'request': request})
+    serializer = IssueSerializer(matching_issues, many=True, context={
+        'request': request, 'attachments': AttachmentResolver.for_issues(matching_issues)
+    })
     
     return Response({
         "message": "Troubleshoot request received",
         "matching_issues": serializer.data
     })
 
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAdminUser])
+def issue_index_stats(request):
+    """
+    Reports the size and build time of the in-process issue index.
+    POST rebuilds it first.
+    """
+    if not issue_index.enabled:
+        return Response({"error": "Issue search index is disabled"}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'POST':
+        issue_index.build()
+    return Response(issue_index.stats())
+
 @api_view(['GET', 'POST'])
 @permission_classes([permissions.IsAuthenticated])
 def machine_issues(request, machine_id):
@@ -115,9 +191,14 @@ def machine_issues(request, machine_id):
         return Response({"error": "Machine not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        issues = Issue.objects.filter(machine=machine)
-        serializer = IssueSerializer(issues, many=True, context={'request': request})
-        return Response(serializer.data)
+        etag = machine_etag(request, machine.id, 'issues')
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        # Built from .values() rows; same data as IssueSerializer
+        data = serialize_issues(Issue.objects.filter(machine=machine), {'request': request})
+        return set_etag(Response(data), etag)
 
     elif request.method == 'POST':
         serializer = IssueSerializer(data=request.data, context={'request': request})
@@ -0,0 +1,25 @@
+# repairmate_backend/api/views/job_views.py
+
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from task_queue.models import Job
+from ..serializers import JobSerializer
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_status(request, job_id):
+    """
+    Returns the state of a background job (e.g. an async template copy) so the
+    client can poll it. Users only see their own jobs; staff see all of them.
+    """
+    try:
+        job = Job.objects.get(id=job_id)
+    except Job.DoesNotExist:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if job.created_by_id != request.user.id and not request.user.is_staff:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(JobSerializer(job).data)
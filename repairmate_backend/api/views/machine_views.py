@@ -2,9 +2,9 @@
 
 import logging
 import os
-from django.db.models import Q
-from django.http import FileResponse
+from django.db.models import Q, Count
 from django.conf import settings
+from django.http import Http404, HttpResponse
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action, parser_classes
@@ -12,15 +12,25 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from ..models import (
     Machine, Manufacturer, EquipmentCategory, Department, MachineType,
-    HiddenTemplate, MachineCopy, Solution, Issue, Step, TroubleshootingGuide
+    HiddenTemplate, MachineCopy
 )
 from ..serializers import (
-    MachineSerializer, ManufacturerSerializer, EquipmentCategorySerializer,
-    DepartmentSerializer, MachineTypeSerializer
+    MachineSerializer, MachineListSerializer, ManufacturerSerializer,
+    EquipmentCategorySerializer, DepartmentSerializer, MachineTypeSerializer
 )
+from ..flat_serializers import ValuesListMixin
 from ..permissions import IsMachineOwnerOrTemplate
-from file_manager.services import save_file, get_files, delete_file
-from file_manager.models import ManagedFile
+from ..pagination import MachineCursorPagination
+from ..machine_cache import machine_detail_cache
+from ..snapshots import snapshots_enabled, current_snapshot
+from ..streaming import requested_stream_format, stream_list
+from ..utils.attachment_utils import AttachmentResolver, prefetch_machine_detail
+from ..utils.copy_utils import copy_machine_template
+from ..utils.etag_utils import machine_etag, not_modified, set_etag
+from ..tasks import copy_machine_template_task
+from file_manager.delivery import serve_file
+from task_queue.queue import enqueue
+from file_manager.services import FileTooLarge, save_file, get_files, get_first_file, delete_file
 
 logger = logging.getLogger(__name__)
 
@@ -28,19 +38,20 @@ class MachineViewSet(viewsets.ModelViewSet):
     queryset = Machine.objects.all()
     serializer_class = MachineSerializer
     permission_classes = [permissions.IsAuthenticated, IsMachineOwnerOrTemplate]
+    pagination_class = MachineCursorPagination
 
     def retrieve(self, request, *args, **kwargs):
-        self.queryset = Machine.objects.select_related(
-            'category', 'manufacturer', 'department', 'machine_type'
-        ).prefetch_related(
-            'issues', 
-            'issues__solutions',
-            'issues__solutions__guide',
-            'issues__solutions__guide__steps'
-        )
-        # Call the standard retrieve method
+        # Call the standard lookup (visibility and permission checks), the detail itself comes from the cache
         instance = self.get_object()
-        serializer = self.get_serializer(instance)
+
+        etag = machine_etag(request, instance.id, 'detail')
+        response = not_modified(request, etag)
+        if response is None:
+            def build():
+                context = self.get_serializer_context()
+                context['attachments'] = prefetch_machine_detail(instance)
+                return self.get_serializer(instance, context=context).data
+            response = Response(machine_detail_cache.get_or_build(instance.id, request, build))
 
         # Log the activity
         request.user.log_activity(
@@ -48,7 +59,7 @@ class MachineViewSet(viewsets.ModelViewSet):
             f"Viewed machine: {instance.name}",
             machine=instance
         )
-        return Response(serializer.data)
+        return set_etag(response, etag)
 
     def get_queryset(self):
         """
@@ -65,6 +76,8 @@ class MachineViewSet(viewsets.ModelViewSet):
             (Q(is_template=True) & ~Q(id__in=hidden_templates))  # Visible templates
         ).exclude(  # Exclude hidden templates
             id__in=hidden_templates
+        ).select_related(  # Names shown by every representation
+            'category', 'manufacturer', 'department', 'machine_type'
         )
 
     def create(self, request, *args, **kwargs):
@@ -112,6 +125,12 @@ class MachineViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    def get_serializer_class(self):
+        # Lists use the compact representation; the full issue tree is only built on detail
+        if self.action == 'list':
+            return MachineListSerializer
+        return MachineSerializer
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({"request": self.request})
@@ -120,9 +139,27 @@ class MachineViewSet(viewsets.ModelViewSet):
     def list(self, request):
         queryset = self.get_queryset().select_related(
             'category', 'manufacturer', 'department', 'machine_type'
+        ).annotate(
+            issue_count=Count('issues', distinct=True),
+            solution_count=Count('issues__solutions', distinct=True)
         )
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+
+        def serialize(machines):
+            # Resolve images, manuals and copy info for the whole page in two queries
+            context = self.get_serializer_context()
+            context['attachments'] = AttachmentResolver.for_machines(machines)
+            return self.get_serializer(machines, many=True, context=context).data
+
+        # Exports: ?stream=json|ndjson writes the machines batch by batch instead of building the whole list
+        stream_format = requested_stream_format(request)
+        if stream_format:
+            return stream_list(queryset, serialize, stream_format)
+
+        page = self.paginate_queryset(queryset)
+        data = serialize(list(page if page is not None else queryset))
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
     
     @action(detail=True, methods=['POST'])
     def copy_template(self, request, pk=None):
@@ -152,100 +189,21 @@ class MachineViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Create a new copy of the machine
-            new_machine = Machine.objects.create(
-                name=original_machine.name,
-                model=original_machine.model,
-                series=original_machine.series,
-                description=original_machine.description,
-                category=original_machine.category,
-                manufacturer=original_machine.manufacturer,
-                department=original_machine.department,
-                machine_type=original_machine.machine_type,
-                owner=request.user,
-                is_template=False
-            )
-
-            # Register the new copy in the MachineCopy table
-            MachineCopy.objects.create(
-                original_template=original_machine,
-                user=request.user,
-                machine=new_machine
-            )
-
-            # Copy images and manual files if they exist
-            for managed_file in ManagedFile.objects.filter(
-                associated_model='Machine',
-                associated_id=original_machine.id
-            ):
-                save_file(
-                    managed_file.file,
-                    managed_file.file_type,
-                    'Machine',
-                    new_machine.id
+            # Optionally copy in the background: the client polls /api/jobs/<job_id>/ for the machine_id
+            if str(request.query_params.get('async', request.data.get('async', ''))).lower() in ('1', 'true'):
+                job = enqueue(
+                    copy_machine_template_task,
+                    args=[original_machine.id, request.user.id],
+                    user=request.user
                 )
-
-            # For each issue in the original machine
-            for original_issue in original_machine.issues.all():
-                # Create a new copy of the issue
-                new_issue = Issue.objects.create(
-                    machine=new_machine,
-                    title=original_issue.title,
-                    description=original_issue.description,
-                    error_code=original_issue.error_code,
-                    keywords=original_issue.keywords,
-                    created_by=request.user
+                return Response(
+                    {"detail": "Template copy queued",
+                    "job_id": job.id},
+                    status=status.HTTP_202_ACCEPTED
                 )
 
-                # Copy images for the issue if they exist
-                for issue_file in ManagedFile.objects.filter(
-                    associated_model='Issue',
-                    associated_id=original_issue.id
-                ):
-                    save_file(
-                        issue_file.file,
-                        issue_file.file_type,
-                        'Issue',
-                        new_issue.id
-                    )
-
-               
-                for original_solution in original_issue.solutions.all():
-                    new_solution = Solution.objects.create(
-                        issue=new_issue,
-                        description=original_solution.description,
-                        created_by=request.user
-                    )
-
-
-                    if hasattr(original_solution, 'guide'):
-                        original_guide = original_solution.guide
-                        new_guide = TroubleshootingGuide.objects.create(
-                            solution=new_solution,
-                            title=original_guide.title,
-                            created_by=request.user
-                        )
-
-
-                        for original_step in original_guide.steps.all():
-                            new_step = Step.objects.create(
-                                guide=new_guide,
-                                step_number=original_step.step_number,
-                                description=original_step.description,
-                                video_urls=original_step.video_urls
-                            )
-
-
-                            for step_file in ManagedFile.objects.filter(
-                                associated_model='Step',
-                                associated_id=original_step.id
-                            ):
-                                save_file(
-                                    step_file.file,
-                                    step_file.file_type,
-                                    'Step',
-                                    new_step.id
-                                )
+            # Copy the whole tree in one transaction, sharing the stored files
+            new_machine = copy_machine_template(original_machine, request.user)
 
             return Response(
                 {"detail": "Template copied successfully",
@@ -267,7 +225,10 @@ class MachineViewSet(viewsets.ModelViewSet):
         if not file:
             return Response({'error': 'No file provided'}, status=400)
         
-        managed_file = save_file(file, 'IMAGE', 'Machine', machine.id)
+        try:
+            managed_file = save_file(file, 'IMAGE', 'Machine', machine.id)
+        except FileTooLarge as e:
+            return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
         return Response({'message': 'File uploaded successfully', 'file_id': managed_file.id})
 
     @action(detail=True, methods=['GET'])
@@ -290,22 +251,22 @@ class MachineViewSet(viewsets.ModelViewSet):
             return Response({'error': 'File not found'}, status=404)
 
 # Departments
-class ManufacturerViewSet(viewsets.ModelViewSet):
+class ManufacturerViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Manufacturer.objects.all()
     serializer_class = ManufacturerSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class EquipmentCategoryViewSet(viewsets.ModelViewSet):
+class EquipmentCategoryViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = EquipmentCategory.objects.all()
     serializer_class = EquipmentCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class MachineTypeViewSet(viewsets.ModelViewSet):
+class MachineTypeViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = MachineType.objects.all()
     serializer_class = MachineTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -319,15 +280,10 @@ def optimized_machine_detail(request, machine_id):
     Uses select_related and prefetch_related to reduce database queries.
     """
     try:
-        # Use select_related for ForeignKey relationships
-        # and prefetch_related for reverse relationships
+        # Use select_related for ForeignKey relationships; the reverse relationships
+        # are only prefetched when the detail is not cached
         machine = Machine.objects.select_related(
             'category', 'manufacturer', 'department', 'machine_type'
-        ).prefetch_related(
-            'issues',
-            'issues__solutions',
-            'issues__solutions__guide',
-            'issues__solutions__guide__steps'
         ).get(id=machine_id)
         
         # Check permissions
@@ -342,9 +298,23 @@ def optimized_machine_detail(request, machine_id):
             machine=machine
         )
         
+        # Same body as MachineViewSet.retrieve, so the same ETag
+        etag = machine_etag(request, machine.id, 'detail')
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        # Pre-rendered JSON when the snapshot is current (one query, no serialization)
+        if snapshots_enabled() and request.accepted_renderer.format == 'json':
+            content = current_snapshot(request, machine.id)
+            if content is not None:
+                return set_etag(HttpResponse(content, content_type='application/json'), etag)
+
         # Serialize and return the machine data
-        serializer = MachineSerializer(machine, context={'request': request})
-        return Response(serializer.data)
+        def build():
+            attachments = prefetch_machine_detail(machine)
+            return MachineSerializer(machine, context={'request': request, 'attachments': attachments}).data
+        return set_etag(Response(machine_detail_cache.get_or_build(machine.id, request, build)), etag)
     except Machine.DoesNotExist:
         return Response({"error": "Machine not found"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -364,18 +334,14 @@ def upload_machine_manual(request, machine_id):
         if not manual_file.name.endswith('.pdf'):
             return Response({'error': 'File must be a PDF'}, status=400)
         
+        # Save new manual first, so a rejected upload leaves the current one in place
+        managed_file = save_file(manual_file, 'MANUAL', 'Machine', machine_id)
+        
         # Delete existing manual if present
-        existing_manual = ManagedFile.objects.filter(
-            associated_model='Machine',
-            associated_id=machine_id,
-            file_type='MANUAL'
-        ).first()
+        existing_manual = get_files('Machine', machine_id, 'MANUAL').exclude(id=managed_file.id).first()
         
         if existing_manual:
             existing_manual.delete()
-        
-        # Save new manual
-        managed_file = save_file(manual_file, 'MANUAL', 'Machine', machine_id)
         return Response({
             'message': 'Manual uploaded successfully',
             'file_id': managed_file.id,
@@ -383,6 +349,8 @@ def upload_machine_manual(request, machine_id):
         })
     except Machine.DoesNotExist:
         return Response({'error': 'Machine not found'}, status=404)
+    except FileTooLarge as e:
+        return Response({'error': str(e)}, status=413)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -391,25 +359,23 @@ def upload_machine_manual(request, machine_id):
 def get_machine_manual(request, machine_id):
     try:
         machine = Machine.objects.get(id=machine_id)
-        manual = ManagedFile.objects.filter(
-            associated_model='Machine',
-            associated_id=machine_id,
-            file_type='MANUAL'
-        ).first()
+        manual = get_first_file('Machine', machine_id, 'MANUAL')
         
         if not manual:
             return Response({'error': 'No manual found'}, status=404)
 
-        # Open file and retrieve it as FileResponse
-        response = FileResponse(
-            open(manual.file.path, 'rb'),
-            content_type='application/pdf'
+        # Serve the file with byte ranges so PDF viewers only fetch the pages they show
+        return serve_file(
+            request,
+            manual.file,
+            content_type='application/pdf',
+            filename=manual.download_name
         )
-        response['Content-Disposition'] = f'inline; filename="{manual.file.name}"'
-        return response
         
     except Machine.DoesNotExist:
         return Response({'error': 'Machine not found'}, status=404)
+    except Http404:
+        return Response({'error': 'Manual file not found'}, status=404)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -418,11 +384,7 @@ def get_machine_manual(request, machine_id):
 def delete_machine_manual(request, machine_id):
     try:
         machine = Machine.objects.get(id=machine_id)
-        manual = ManagedFile.objects.filter(
-            associated_model='Machine',
-            associated_id=machine_id,
-            file_type='MANUAL'
-        ).first()
+        manual = get_first_file('Machine', machine_id, 'MANUAL')
         
         if not manual:
             return Response({'error': 'No manual found'}, status=404)
@@ -7,7 +7,8 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from ..models import Solution, Issue, Step, TroubleshootingGuide
 from ..serializers import SolutionSerializer, TroubleshootingGuideSerializer, StepSerializer
-from file_manager.services import save_file, get_files, delete_file
+from ..flat_serializers import serialize_solutions
+from file_manager.services import FileTooLarge, save_file, get_files, delete_file
 from file_manager.models import ManagedFile
 
 class StepViewSet(viewsets.ModelViewSet):
@@ -33,7 +34,10 @@ class StepViewSet(viewsets.ModelViewSet):
         if not file:
             return Response({'error': 'No file provided'}, status=400)
         
-        managed_file = save_file(file, 'IMAGE', 'Step', step.id)
+        try:
+            managed_file = save_file(file, 'IMAGE', 'Step', step.id)
+        except FileTooLarge as e:
+            return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
         return Response({'message': 'File uploaded successfully', 'file_id': managed_file.id})
 
     @action(detail=True, methods=['DELETE'])
@@ -61,9 +65,8 @@ def solution_operations(request, issue_id=None, solution_id=None):
     if request.method == 'GET':
         try:
             issue = Issue.objects.get(pk=issue_id)
-            solutions = Solution.objects.filter(issue=issue)
-            serializer = SolutionSerializer(solutions, many=True)
-            return Response(serializer.data)
+            # Built from .values() rows; same data as SolutionSerializer
+            return Response(serialize_solutions(Solution.objects.filter(issue=issue), {}))
         except Issue.DoesNotExist:
             return Response({"error": "Issue not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -174,6 +177,8 @@ def upload_step_image(request, step_id):
         
     except Step.DoesNotExist:
         return Response({"error": "Step not found"}, status=status.HTTP_404_NOT_FOUND)
+    except FileTooLarge as e:
+        return Response({"error": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1,7 +1,10 @@
 # repairmate_backend/api/views/user_views.py
 
 import logging
+from datetime import timedelta
 from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
@@ -9,7 +12,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 from ..models import (
     CustomUser, UserPreferences, UserActivityLog, UserNote,
-    SubscriptionPlan, Organization
+    SubscriptionPlan, Organization, UserActivityDailyCount
 )
 from ..serializers import (
     UserProfileSerializer, UserPreferencesSerializer, UserActivityLogSerializer,
@@ -17,6 +20,7 @@ from ..serializers import (
     OrganizationSerializer, TeamMemberSerializer
 )
 from ..permissions import CanUpdateUserProfile
+from ..pagination import ActivityLogCursorPagination
 
 
 logger = logging.getLogger(__name__)
@@ -206,9 +210,12 @@ class UserPreferencesViewSet(viewsets.ModelViewSet):
 class UserActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = UserActivityLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ActivityLogCursorPagination
 
     def get_queryset(self):
-        queryset = UserActivityLog.objects.filter(user=self.request.user)
+        queryset = UserActivityLog.objects.filter(
+            user=self.request.user
+        ).select_related('machine', 'issue')
         
         # Filter by date range if provided
         start_date = self.request.query_params.get('start_date', None)
@@ -221,6 +228,63 @@ class UserActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
             
         return queryset
 
+# Dashboard statistics from the daily activity counts, instead of counting raw logs in the browser
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def activity_stats(request):
+    try:
+        days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+    except ValueError:
+        return Response({'error': 'days and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        since = timezone.localdate() - timedelta(days=days - 1)
+        counts = UserActivityDailyCount.objects.filter(user=request.user, date__gte=since)
+
+        totals = {
+            row['activity_type']: row['total']
+            for row in counts.values('activity_type').annotate(total=Sum('count'))
+        }
+        views_per_machine = (
+            counts.filter(activity_type='MACHINE_VIEW', machine__isnull=False)
+            .values('machine_id', 'machine__name')
+            .annotate(views=Sum('count'))
+            .order_by('-views', 'machine_id')[:limit]
+        )
+        issues_created_per_day = (
+            counts.filter(activity_type='ISSUE_CREATE')
+            .values('date')
+            .annotate(created=Sum('count'))
+            .order_by('date')
+        )
+        most_viewed_issues = (
+            counts.filter(activity_type='ISSUE_VIEW', issue__isnull=False)
+            .values('issue_id', 'issue__title')
+            .annotate(views=Sum('count'))
+            .order_by('-views', 'issue_id')[:limit]
+        )
+
+        return Response({
+            'since': since,
+            'totals': totals,
+            'views_per_machine': [
+                {'machine_id': row['machine_id'], 'machine_name': row['machine__name'], 'views': row['views']}
+                for row in views_per_machine
+            ],
+            'issues_created_per_day': [
+                {'date': row['date'], 'created': row['created']}
+                for row in issues_created_per_day
+            ],
+            'most_viewed_issues': [
+                {'issue_id': row['issue_id'], 'issue_title': row['issue__title'], 'views': row['views']}
+                for row in most_viewed_issues
+            ],
+        })
+    except Exception as e:
+        logger.error(f"Error building activity stats: {str(e)}")
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class UserNoteViewSet(viewsets.ModelViewSet):
     serializer_class = UserNoteSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -0,0 +1,157 @@
+# file_manager/delivery.py
+# Serves stored files with byte ranges and conditional requests, or hands the transfer to the front proxy
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+# Only single ranges are served as 206; anything else gets the whole file
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+OFFLOAD_ACCEL_REDIRECT = 'x-accel-redirect'
+OFFLOAD_SENDFILE = 'x-sendfile'
+
+
+class FileRange:
+    # File-like wrapper returning `length` bytes of `file` starting at `start`
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Returns (start, end) for a single `bytes=` range of a file of `size` bytes,
+    None when the header is absent or not a single range (serve the whole file),
+    or False when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def file_etag(stat):
+    # Built from size and modification time, so the file is never read to compute it
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def _if_range_passes(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and if_range_date >= last_modified
+
+
+def _offload_response(path, content_type):
+    mode = settings.FILE_DELIVERY_OFFLOAD
+    response = HttpResponse(content_type=content_type)
+    if mode == OFFLOAD_ACCEL_REDIRECT:
+        # nginx serves the file from an internal location mapped to MEDIA_ROOT
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.FILE_DELIVERY_ACCEL_PREFIX.rstrip('/') + '/' + quote(relative_path)
+    else:
+        # Apache (mod_xsendfile) and lighttpd read the absolute path
+        response['X-Sendfile'] = path
+    return response
+
+
+def serve_path(request, path, content_type=None, filename=None, as_attachment=False):
+    """
+    Returns a response for the file at `path` supporting Range, If-Range,
+    If-None-Match and If-Modified-Since. When FILE_DELIVERY_OFFLOAD is set the
+    body is left to the front proxy (X-Accel-Redirect or X-Sendfile).
+    """
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+    if not os.path.isfile(path):
+        raise Http404('File not found')
+
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if settings.FILE_DELIVERY_OFFLOAD in (OFFLOAD_ACCEL_REDIRECT, OFFLOAD_SENDFILE):
+            response = _offload_response(path, content_type)
+        else:
+            response = _stream_response(request, path, stat.st_size, content_type, etag, last_modified)
+        if filename and response.status_code != 416:
+            # Quotes and non-ASCII characters of uploaded names are escaped (filename*=utf-8'')
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _stream_response(request, path, size, content_type, etag, last_modified):
+    byte_range = None
+    if _if_range_passes(request, etag, last_modified):
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(FileRange(open(path, 'rb'), start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_file(request, field_file, content_type=None, filename=None, as_attachment=False):
+    # Serves a FileField value; storages without local paths (e.g. S3) handle ranges themselves
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        return HttpResponseRedirect(field_file.url)
+    return serve_path(request, path, content_type=content_type, filename=filename, as_attachment=as_attachment)
@@ -0,0 +1,111 @@
+# file_manager/derivatives.py
+# Resized WebP/AVIF copies of uploaded images, generated once per blob by the task queue worker
+
+import io
+import logging
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+from task_queue.queue import enqueue
+from .models import FileBlob, derivative_path
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # pip install Pillow
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Pillow feature names, encoder names and mime types of the formats we can produce
+FORMATS = {
+    'avif': ('avif', 'AVIF', 'image/avif'),
+    'webp': ('webp', 'WEBP', 'image/webp'),
+}
+QUALITY = 80
+
+# Sent with blob= once the derivatives of a blob are recorded (the update sends no post_save)
+derivatives_generated = Signal()
+
+
+def available_formats():
+    # Configured formats this Pillow build can encode, in the configured order
+    if Image is None:
+        return []
+    return [fmt for fmt in settings.IMAGE_DERIVATIVE_FORMATS if fmt in FORMATS and features.check(FORMATS[fmt][0])]
+
+
+def _encode(image, width, fmt):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format=FORMATS[fmt][1], quality=QUALITY)
+    return buffer.getvalue()
+
+
+def generate_derivatives(blob):
+    """
+    Creates the configured widths of an image blob in every available format and
+    records them on the blob. Widths at or above the original width are skipped.
+    Returns the list of variants (empty for non-images or without Pillow).
+    """
+    formats = available_formats()
+    if not formats or blob.derivatives:
+        return blob.derivatives
+
+    try:
+        with blob.file.open('rb') as stored:
+            image = ImageOps.exif_transpose(Image.open(stored))
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning(f"No derivatives for blob {blob.id}: {e}")
+        return []
+
+    variants = []
+    for width in sorted(settings.IMAGE_DERIVATIVE_WIDTHS):
+        if width >= image.width:
+            break
+        for fmt in formats:
+            name = derivative_path(blob.sha256, width, fmt)
+            if default_storage.exists(name):
+                size = default_storage.size(name)
+            else:
+                content = _encode(image, width, fmt)
+                size = len(content)
+                name = default_storage.save(name, ContentFile(content))
+            variants.append({'width': width, 'format': fmt, 'file': name, 'size': size})
+
+    if not FileBlob.objects.filter(pk=blob.pk).update(derivatives=variants):
+        # The blob was released while we were working on it
+        for variant in variants:
+            default_storage.delete(variant['file'])
+        return []
+    blob.derivatives = variants
+    derivatives_generated.send(sender=FileBlob, blob=blob)
+    return variants
+
+
+def schedule_derivatives(blob):
+    # Queues the generation of the derivatives of a new image blob
+    from .tasks import generate_image_derivatives  # tasks.py imports this module
+    if not available_formats() or blob.derivatives:
+        return None
+    return enqueue(generate_image_derivatives, args=[blob.id])
+
+
+def image_srcset(managed_file, build_url=None):
+    """
+    Returns {mime type: srcset} for an image, e.g.
+    {'image/webp': '/media/derivatives/..._320w.webp 320w, ..._640w.webp 640w'}.
+    Empty until the derivatives have been generated.
+    """
+    if not managed_file.blob_id or not managed_file.blob.derivatives:
+        return {}
+
+    srcset = {}
+    for variant in managed_file.blob.derivatives:
+        url = default_storage.url(variant['file'])
+        if build_url:
+            url = build_url(url)
+        srcset.setdefault(FORMATS[variant['format']][2], []).append(f"{url} {variant['width']}w")
+    return {mime: ', '.join(candidates) for mime, candidates in srcset.items()}
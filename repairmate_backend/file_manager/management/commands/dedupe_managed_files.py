@@ -0,0 +1,46 @@
+# file_manager/management/commands/dedupe_managed_files.py
+# python3 manage.py dedupe_managed_files
+
+import os
+from django.core.management.base import BaseCommand
+from file_manager.models import ManagedFile
+from file_manager.services import store_blob
+
+
+class Command(BaseCommand):
+    help = 'Moves files stored before the blob store existed into content-addressed blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+
+    def handle(self, *args, **options):
+        legacy_files = ManagedFile.objects.filter(blob__isnull=True).order_by('id')
+        moved = 0
+        freed = 0
+
+        for managed_file in legacy_files.iterator():
+            old_name = managed_file.file.name
+            if not old_name or not managed_file.file.storage.exists(old_name):
+                self.stdout.write(self.style.WARNING(f'Missing file for ManagedFile {managed_file.id}: {old_name}'))
+                continue
+
+            if options['dry_run']:
+                self.stdout.write(f'Would move {old_name}')
+                continue
+
+            with managed_file.file.open('rb') as stored:
+                blob = store_blob(stored, old_name)
+
+            managed_file.blob = blob
+            managed_file.file.name = blob.file.name
+            # The blob path is a hash: keep the old name for downloads
+            managed_file.original_name = managed_file.original_name or os.path.basename(old_name)[:255]
+            managed_file.save(update_fields=['blob', 'file', 'original_name'])
+            moved += 1
+
+            # Remove the old file once no other legacy row points at it
+            if old_name != blob.file.name and not ManagedFile.objects.filter(file=old_name).exists():
+                freed += managed_file.file.storage.size(old_name)
+                managed_file.file.storage.delete(old_name)
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} files into the blob store, freed {freed} bytes'))
@@ -0,0 +1,31 @@
+# file_manager/management/commands/generate_image_derivatives.py
+# python3 manage.py generate_image_derivatives
+
+from django.core.management.base import BaseCommand
+from file_manager.derivatives import available_formats, generate_derivatives
+from file_manager.models import FileBlob
+
+
+class Command(BaseCommand):
+    help = 'Generates the resized versions of stored images that do not have them yet'
+
+    def handle(self, *args, **options):
+        formats = available_formats()
+        if not formats:
+            self.stdout.write(self.style.WARNING('Pillow is not installed or supports none of IMAGE_DERIVATIVE_FORMATS'))
+            return
+
+        blobs = FileBlob.objects.filter(
+            managed_files__file_type='IMAGE',
+            derivatives=[]
+        ).distinct().order_by('id')
+
+        processed = 0
+        created = 0
+        for blob in blobs.iterator():
+            created += len(generate_derivatives(blob))
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} images, created {created} derivatives ({', '.join(formats)})"
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_manager', '0004_file_blob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='managedfile',
+            index=models.Index(fields=['associated_model', 'associated_id', 'file_type'], name='managedfile_owner_idx'),
+        ),
+    ]
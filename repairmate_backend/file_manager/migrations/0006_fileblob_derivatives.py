@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_manager', '0005_managedfile_owner_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileblob',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_manager', '0006_fileblob_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='managedfile',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
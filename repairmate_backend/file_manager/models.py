@@ -1,29 +1,105 @@
 # file_manager/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 import os
 
+
+def blob_path(sha256, extension=''):
+    # Content-addressed location, sharded by the first two byte pairs of the hash: blobs/ab/cd/abcd...ext
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension.lower()}"
+
+
+def derivative_path(sha256, width, extension):
+    # Resized copies live next to the blobs, with the same sharding: derivatives/ab/cd/abcd..._320w.webp
+    return f"derivatives/{sha256[:2]}/{sha256[2:4]}/{sha256}_{width}w.{extension}"
+
+
+class FileBlob(models.Model):
+    # Stores one copy of each distinct file content, keyed by its SHA-256 hash.
+    # ManagedFile rows point at a blob; the blob is removed when its last reference goes away.
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    # Resized copies of images: [{'width': 320, 'format': 'webp', 'file': 'derivatives/...', 'size': 1234}]
+    derivatives = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} refs)"
+
+    @classmethod
+    def add_references(cls, blob_id, count=1):
+        cls.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + count)
+
+    @classmethod
+    def release(cls, blob_id):
+        # Drops one reference and deletes the stored content once nothing references it
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(pk=blob_id).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                blob.ref_count -= 1
+                blob.save(update_fields=['ref_count'])
+                return
+            names = [blob.file.name] + [variant['file'] for variant in blob.derivatives]
+            storage = blob.file.storage
+            blob.delete()
+
+        # Only touch the storage once the row is gone for good
+        def delete_files():
+            for name in names:
+                storage.delete(name)
+        transaction.on_commit(delete_files)
+
+
 class ManagedFile(models.Model):
     # This model manages files uploaded to the Django application. It handles file storage and relationships to other models.
     file = models.FileField(
         upload_to='managed_files/',  # Specifies the directory where files are stored.
         max_length=255  # Defines the maximum length of the file path.
     )
+    # Content-addressed blob holding the file (None for files stored before the blob store existed)
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='managed_files')
+    # Name of the uploaded file, used as the download name (the stored name is the content hash)
+    original_name = models.CharField(max_length=255, blank=True)
     file_type = models.CharField(max_length=50)
     associated_model = models.CharField(max_length=255)
     associated_id = models.IntegerField()
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Attachment lookups always filter on the owner, and usually on the file type
+            models.Index(fields=['associated_model', 'associated_id', 'file_type'], name='managedfile_owner_idx'),
+        ]
+
     def __str__(self):
         # Returns a string representation combining the associated model, ID, and file name.
         return f"{self.associated_model}_{self.associated_id}_{self.file.name}"
 
+    @property
+    def download_name(self):
+        # Rows saved before original_name existed fall back to the stored name
+        return self.original_name or os.path.basename(self.file.name)
+
     def get_absolute_url(self):
         # Provides the URL to access the file directly.
         return self.file.url
 
     def delete(self, *args, **kwargs):
         # Custom delete method to remove the file from the filesystem upon deletion of the model instance.
-        if self.file:
+        if self.blob_id:
+            # Shared blob: release our reference, the blob removes the content when it is the last one
+            blob_id = self.blob_id
+            with transaction.atomic():
+                super(ManagedFile, self).delete(*args, **kwargs)
+                FileBlob.release(blob_id)
+            return
+
+        # Legacy files: template copies reference the same stored file, so it is only removed with its last reference.
+        if self.file and not ManagedFile.objects.filter(file=self.file.name).exclude(pk=self.pk).exists():
             if os.path.isfile(self.file.path):
                 os.remove(self.file.path)
         super(ManagedFile, self).delete(*args, **kwargs)
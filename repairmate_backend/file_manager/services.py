@@ -1,63 +1,145 @@
 # file_manager/services.py
-from .models import ManagedFile
+from .models import ManagedFile, FileBlob, blob_path
+from .derivatives import schedule_derivatives
+from django.conf import settings
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.db import transaction, IntegrityError
+import hashlib
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+
+class FileTooLarge(Exception):
+    # Raised when an upload exceeds MANAGED_FILE_MAX_SIZE
+    def __init__(self, size, max_size):
+        self.size = size
+        self.max_size = max_size
+        super().__init__(f"File is larger than the maximum allowed size of {max_size} bytes")
+
+
+def hash_file(file, max_size=None):
+    """
+    Returns (sha256, size) of a Django File, reading it chunk by chunk so the
+    content is never held in memory. Raises FileTooLarge past `max_size` bytes.
+    """
+    # Uploads know their size up front; reject them before reading anything
+    known_size = getattr(file, 'size', None)
+    if max_size and known_size and known_size > max_size:
+        raise FileTooLarge(known_size, max_size)
+
+    sha256 = hashlib.sha256()
+    size = 0
+    for chunk in file.chunks():
+        size += len(chunk)
+        if max_size and size > max_size:
+            raise FileTooLarge(size, max_size)
+        sha256.update(chunk)
+    return sha256.hexdigest(), size
+
+
+def store_blob(file, original_name=None, max_size=None):
+    """
+    Returns the FileBlob holding the content of `file` (a Django File) with one
+    more reference. Identical content is stored only once, whatever the original
+    file name. The content is streamed twice at most: once to hash it, and once
+    to write it when it is not stored yet.
+    """
+    sha256, size = hash_file(file, max_size)
+
+    with transaction.atomic():
+        blob = FileBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is not None:
+            blob.ref_count += 1
+            blob.save(update_fields=['ref_count'])
+            return blob
+
+    # Always written, even if a file is already at this path: it may belong to a blob whose release is about
+    # to delete it (FileBlob.release), so the storage picks a free name rather than reusing it.
+    # The storage copies chunk by chunk (or moves the temporary file of large uploads).
+    name = default_storage.save(blob_path(sha256, os.path.splitext(original_name or file.name)[1]), file)
+
+    try:
+        with transaction.atomic():
+            return FileBlob.objects.create(sha256=sha256, file=name, size=size, ref_count=1)
+    except IntegrityError:
+        # Another request stored the same content in the meantime; nothing points to our copy
+        blob = FileBlob.objects.get(sha256=sha256)
+        if name != blob.file.name:
+            default_storage.delete(name)
+        FileBlob.add_references(blob.id)
+        blob.refresh_from_db()
+        return blob
+
+
 def save_file(file, file_type, associated_model, associated_id):
     # Logs the operation of saving a file.
-    print(f"Saving file: {file.name} for {associated_model} {associated_id}")  # Debug
-    
-    # Creates a new ManagedFile instance.
-    managed_file = ManagedFile(
-        file_type=file_type,
-        associated_model=associated_model,
-        associated_id=associated_id
-    )
-
-    # Constructs a file name that reflects its association.
-    file_name = f"{associated_model}_{associated_id}_{file.name}"
-    # Saves the file to the designated storage and obtains the path.
-    file_path = default_storage.save(f'managed_files/{file_name}', ContentFile(file.read()))
+    logger.debug(f"Saving file: {file.name} for {associated_model} {associated_id}")
     
-    # Assigns the stored file path to the managed file object and saves it to the database.
-    managed_file.file.name = file_path
-    managed_file.save()
+    # The blob reference and the row holding it are saved together, so a failed insert cannot leak the reference.
+    with transaction.atomic():
+        # Streams the content into the blob store (once per distinct content) and gets its path.
+        blob = store_blob(file, file.name, max_size=settings.MANAGED_FILE_MAX_SIZE)
+
+        # Creates a new ManagedFile instance pointing at the stored blob.
+        managed_file = ManagedFile.objects.create(
+            file=blob.file.name,
+            blob=blob,
+            original_name=os.path.basename(file.name or '')[:255],
+            file_type=file_type,
+            associated_model=associated_model,
+            associated_id=associated_id
+        )
+
+        # Resized copies of images are generated once per blob, outside the request.
+        if file_type == 'IMAGE':
+            schedule_derivatives(blob)
     
     # Logs details about the saved file.
-    print(f"File saved as: {file_path}")  # Debug
-    print(f"File URL: {managed_file.file.url}")  # Debug
+    logger.debug(f"File saved as: {managed_file.file.name}")
     
     return managed_file
 
 
-def get_files(associated_model, associated_id):
-    # Logs retrieval of files associated with a specific model and ID.
-    print(f"\n--- get_files() called for {associated_model} with ID {associated_id} ---")
-    
-    # Fetches files matching the provided model and ID.
-    files = ManagedFile.objects.filter(associated_model=associated_model, associated_id=associated_id)
-    
-    print(f"Number of files found: {files.count()}")
-    
-    for file in files:
-        print(f"File ID: {file.id}")
-        print(f"File name: {file.file.name}")
-        print(f"File URL: {file.file.url}")
-        print(f"File path: {file.file.path}")
-        print(f"File type: {file.file_type}")
-        print(f"Upload date: {file.uploaded_at}")
-        print("---")
-    
-    # Logs if no files were found.
-    if not files:
-        print("No files found for this machine.")
+def get_files(associated_model, associated_id, file_type=None):
+    # Returns the files attached to one object, optionally of a single type (IMAGE, MANUAL...).
+    files = ManagedFile.objects.filter(
+        associated_model=associated_model, associated_id=associated_id
+    ).select_related('blob')
+    if file_type:
+        files = files.filter(file_type=file_type)
     
-    print("--- End of get_files() ---\n")
+    logger.debug(f"get_files() for {associated_model} {associated_id} ({file_type or 'all types'})")
     
-    return files
+    return files.order_by('id')
+
+
+def get_first_file(associated_model, associated_id, file_type=None):
+    # Returns the oldest file attached to one object, or None.
+    return get_files(associated_model, associated_id, file_type).first()
+
+
+def get_files_for_many(associated_model, associated_ids, file_type=None):
+    """
+    Returns {associated_id: [ManagedFile, ...]} for many objects of the same
+    model in a single query. Every requested id is present, with an empty list
+    when nothing is attached to it.
+    """
+    associated_ids = list(associated_ids)
+    grouped = {associated_id: [] for associated_id in associated_ids}
+    if not associated_ids:
+        return grouped
+
+    files = ManagedFile.objects.filter(
+        associated_model=associated_model, associated_id__in=associated_ids
+    ).select_related('blob')
+    if file_type:
+        files = files.filter(file_type=file_type)
+
+    for managed_file in files.order_by('id'):
+        grouped[managed_file.associated_id].append(managed_file)
+    return grouped
 
 def delete_file(file_id, file_type=None):
     try:
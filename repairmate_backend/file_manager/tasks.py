@@ -0,0 +1,15 @@
+# file_manager/tasks.py
+# Background tasks run by the task_queue worker
+
+from task_queue.queue import task
+from .derivatives import generate_derivatives
+from .models import FileBlob
+
+
+@task(max_attempts=3, backoff=60)
+def generate_image_derivatives(blob_id):
+    # The blob may have been released before the worker got to it
+    blob = FileBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return {'derivatives': 0}
+    return {'derivatives': len(generate_derivatives(blob))}
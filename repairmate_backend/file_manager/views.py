@@ -1,3 +1,17 @@
-from django.shortcuts import render
+# file_manager/views.py
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+from .delivery import serve_path
 
-# Create your views here.
+
+@require_safe
+def serve_media(request, path):
+    # Serves files under MEDIA_ROOT with byte ranges and conditional requests (replaces django.views.static.serve)
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    return serve_path(request, full_path)
@@ -37,6 +37,18 @@ ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').sp
 # File upload permissions, adjust if issues occur with file uploads
 # FILE_UPLOAD_PERMISSIONS = 0o644
 
+# Largest file accepted by the file manager, in bytes (manuals included)
+MANAGED_FILE_MAX_SIZE = int(os.environ.get('MANAGED_FILE_MAX_SIZE', str(50 * 1024 * 1024)))
+
+# Hand file transfers to the front proxy: '' (Django streams them), 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache)
+FILE_DELIVERY_OFFLOAD = os.environ.get('FILE_DELIVERY_OFFLOAD', '').lower()
+# nginx internal location aliased to MEDIA_ROOT, used with x-accel-redirect
+FILE_DELIVERY_ACCEL_PREFIX = os.environ.get('FILE_DELIVERY_ACCEL_PREFIX', '/protected-media/')
+
+# Resized copies of uploaded images (needs Pillow): widths in pixels and formats, best first
+IMAGE_DERIVATIVE_WIDTHS = [int(w) for w in os.environ.get('IMAGE_DERIVATIVE_WIDTHS', '320,640,1280').split(',') if w]
+IMAGE_DERIVATIVE_FORMATS = [f for f in os.environ.get('IMAGE_DERIVATIVE_FORMATS', 'avif,webp').lower().split(',') if f]
+
 # AWS S3 configuration for the file manager in production
 # These settings are used to configure AWS S3 storage for file management
 # Ensure to use the .env file to set these values
@@ -63,17 +75,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # Trigram lookups used by issue matching
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
     'api',
     'core',
     'file_manager',
+    'task_queue',
     'debug_toolbar', # New
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.QueryCountMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware', # New
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -161,6 +176,19 @@ DATABASES = {
     }
 }
 
+# Cache: 'locmem' (per process, default) or 'file' (shared by the processes of one host, CACHE_LOCATION directory)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem').lower()
+CACHES = {
+    'default': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if CACHE_BACKEND == 'file'
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache') if CACHE_BACKEND == 'file' else 'repairmate'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '1000'))},
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -192,7 +220,17 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # JSON through orjson when it is installed (pip install orjson), the stdlib encoder otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # CORS settings for handling cross-origin requests
@@ -233,14 +271,25 @@ if DEBUG:
                 'level': 'DEBUG',
                 'propagate': True,
             },
+            # Query count and database time of every request
+            'api.middleware': {
+                'handlers': ['console'],
+                'level': 'DEBUG',
+                'propagate': True,
+            },
         },
     }
 
 # Email service configuration using EMAILIT
 EMAILIT_API_KEY = config('EMAILIT_API_KEY', default='')
 EMAILIT_FROM_EMAIL = config('EMAILIT_FROM_EMAIL', default='noreply@repairmate.io')
-
-#EMAILIT_API_URL = os.environ.get('EMAILIT_API_URL', 'https://api.emailit.com/v1/emails')
+EMAILIT_API_URL = os.environ.get('EMAILIT_API_URL', 'https://api.emailit.com/v1/emails')
+# Seconds to open a connection / wait for the answer, and connections kept open per process
+EMAILIT_CONNECT_TIMEOUT = float(os.environ.get('EMAILIT_CONNECT_TIMEOUT', '5'))
+EMAILIT_READ_TIMEOUT = float(os.environ.get('EMAILIT_READ_TIMEOUT', '15'))
+EMAILIT_POOL_SIZE = int(os.environ.get('EMAILIT_POOL_SIZE', '10'))
+# Class that sends the emails: the Emailit API, or api.utils.email_utils.LocmemTransport to keep them in memory
+EMAIL_TRANSPORT = os.environ.get('EMAIL_TRANSPORT', 'api.utils.email_utils.EmailitTransport')
 
 if not EMAILIT_API_KEY:
     import warnings
@@ -248,3 +297,43 @@ if not EMAILIT_API_KEY:
 
 # Enable or disable email sending
 SEND_EMAILS = os.environ.get('SEND_EMAILS', 'True').lower() == 'true'
+
+# In-process inverted index for match_issues (falls back to the database search when disabled)
+ISSUE_SEARCH_INDEX_ENABLED = os.environ.get('ISSUE_SEARCH_INDEX_ENABLED', 'False').lower() == 'true'
+# Seconds between checks for issues changed by other workers
+ISSUE_SEARCH_INDEX_SYNC_INTERVAL = int(os.environ.get('ISSUE_SEARCH_INDEX_SYNC_INTERVAL', '30'))
+
+# Background jobs are stored in the database and run by `manage.py run_worker`.
+# With TASK_QUEUE_IMMEDIATE they run in the web process right after the request commits (no worker needed).
+TASK_QUEUE_IMMEDIATE = os.environ.get('TASK_QUEUE_IMMEDIATE', 'False').lower() == 'true'
+# Seconds after which a running job whose worker disappeared is picked up again
+TASK_QUEUE_JOB_TIMEOUT = int(os.environ.get('TASK_QUEUE_JOB_TIMEOUT', '600'))
+# Seconds succeeded jobs are kept (job status lookups)
+TASK_QUEUE_RESULT_TTL = int(os.environ.get('TASK_QUEUE_RESULT_TTL', str(7 * 24 * 3600)))
+
+# Activity logs are buffered per process and written in batches (False: one INSERT per event)
+ACTIVITY_LOG_BUFFER_ENABLED = os.environ.get('ACTIVITY_LOG_BUFFER_ENABLED', 'True').lower() == 'true'
+# Write when this many events are waiting, or every ACTIVITY_LOG_FLUSH_INTERVAL seconds
+ACTIVITY_LOG_BUFFER_SIZE = int(os.environ.get('ACTIVITY_LOG_BUFFER_SIZE', '100'))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', '5'))
+# Record repeated views of the same machine/issue by a user once per window, in seconds (0: record all)
+ACTIVITY_LOG_DEDUPE_WINDOW = int(os.environ.get('ACTIVITY_LOG_DEDUPE_WINDOW', '0'))
+# Days of raw activity logs kept by prune_activity_logs; older ones survive as daily counts
+ACTIVITY_LOG_RETENTION_DAYS = int(os.environ.get('ACTIVITY_LOG_RETENTION_DAYS', '90'))
+
+# Serialized machine details are cached per machine and invalidated when the machine or its content changes.
+# The version stamps are stored in the database, so an edit reaches every process; CACHE_BACKEND=file
+# only lets the processes of a host share the cached details themselves.
+MACHINE_DETAIL_CACHE_ENABLED = os.environ.get('MACHINE_DETAIL_CACHE_ENABLED', 'True').lower() == 'true'
+# Seconds a cached detail is kept (also bounds staleness for changes that send no signal, e.g. a renamed manufacturer)
+MACHINE_DETAIL_CACHE_TIMEOUT = int(os.environ.get('MACHINE_DETAIL_CACHE_TIMEOUT', '3600'))
+
+# optimized_machine_detail serves pre-rendered JSON snapshots, rendered again by the worker after every change
+MACHINE_SNAPSHOTS_ENABLED = os.environ.get('MACHINE_SNAPSHOTS_ENABLED', 'True').lower() == 'true'
+# Seconds to wait before rendering, so a burst of edits (e.g. saving a guide with many steps) is rendered once
+MACHINE_SNAPSHOT_REBUILD_DELAY = int(os.environ.get('MACHINE_SNAPSHOT_REBUILD_DELAY', '2'))
+
+# Send X-DB-Query-Count / X-DB-Query-Time headers (keep off in production)
+QUERY_COUNT_HEADERS = os.environ.get('QUERY_COUNT_HEADERS', str(DEBUG)).lower() == 'true'
+# Requests running more queries than this are logged as warnings (api.middleware logger)
+QUERY_COUNT_WARN_THRESHOLD = int(os.environ.get('QUERY_COUNT_WARN_THRESHOLD', '100'))
@@ -7,6 +7,7 @@ from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.static import serve
+from file_manager.views import serve_media
 import os
 
 # Defined Build's route of React/Vite if its'n present in settings.py
@@ -39,10 +40,8 @@ urlpatterns = [
         'path': '.vite/manifest.json'
     }),
     
-    # Serve mulitmedia files
-    re_path(r'^media/(?P<path>.*)$', serve, {
-        'document_root': settings.MEDIA_ROOT,
-    }),
+    # Serve mulitmedia files (byte ranges for manuals, offloaded to the proxy when configured)
+    re_path(r'^media/(?P<path>.*)$', serve_media),
     
     # Handle all other routes with React
     re_path(r'^(?!api/)(?!admin/)(?!media/)(?!static/).*$', 
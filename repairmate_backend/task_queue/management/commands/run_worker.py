@@ -0,0 +1,51 @@
+# task_queue/management/commands/run_worker.py
+# python3 manage.py run_worker
+
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from task_queue.queue import claim_next_job, execute, purge_finished_jobs, worker_name
+
+# Seconds between two purges of old succeeded jobs
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs (emails, template copies, image derivatives) from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due, then exit')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_name()} started'))
+        processed = 0
+        last_purge = 0.0
+
+        while not self.stopping:
+            if time.monotonic() - last_purge >= PURGE_INTERVAL:
+                purge_finished_jobs()
+                last_purge = time.monotonic()
+
+            # Drop connections the database closed while we were idle
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            execute(job)
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped after {processed} jobs'))
+
+    # Finish the current job, then exit
+    def stop(self, signum, frame):
+        self.stopping = True
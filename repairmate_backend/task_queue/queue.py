@@ -0,0 +1,155 @@
+# task_queue/queue.py
+# Task registry, enqueueing and execution of jobs stored in the database
+
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered task name -> TaskSpec
+_registry = {}
+
+# Longest wait between two attempts of a job
+MAX_BACKOFF = 3600
+
+
+class TaskSpec:
+    def __init__(self, func, name, max_attempts, backoff):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.backoff = backoff  # Seconds before the first retry, doubled on each retry
+
+    def retry_delay(self, attempts):
+        return min(self.backoff * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def task(name=None, max_attempts=3, backoff=30):
+    """
+    Registers a function as a background task:
+
+        @task(max_attempts=5)
+        def send_report(report_id): ...
+
+        enqueue(send_report, args=[report.id])
+
+    Arguments and return values go through JSON, so pass ids rather than model instances.
+    """
+    def decorator(func):
+        spec = TaskSpec(func, name or f"{func.__module__}.{func.__name__}", max_attempts, backoff)
+        _registry[spec.name] = spec
+        func.task_name = spec.name
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def enqueue(func, args=(), kwargs=None, user=None, delay=0):
+    """
+    Stores a job for a registered task and returns it. Workers pick it up once
+    the current transaction commits; with TASK_QUEUE_IMMEDIATE it runs in this
+    process right after the commit instead.
+    """
+    spec = _registry[func.task_name]
+    job = Job.objects.create(
+        task=spec.name,
+        payload={'args': list(args), 'kwargs': kwargs or {}},
+        max_attempts=spec.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        created_by=user
+    )
+    if settings.TASK_QUEUE_IMMEDIATE:
+        transaction.on_commit(lambda: run_job(job.id))
+    return job
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claim(jobs):
+    # Marks the first runnable job as running; rows locked by other workers are skipped
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.TASK_QUEUE_JOB_TIMEOUT)
+    # A worker died while running its last attempt: give up rather than let it stop the next worker too
+    jobs.filter(
+        status='RUNNING', started_at__lt=stale_before, attempts__gte=F('max_attempts')
+    ).update(status='FAILED', error='The worker stopped while running the last attempt', finished_at=now)
+    with transaction.atomic():
+        job = jobs.filter(
+            Q(status='PENDING', run_at__lte=now) |
+            # A worker died while running it
+            Q(status='RUNNING', started_at__lt=stale_before, attempts__lt=F('max_attempts'))
+        ).select_for_update(skip_locked=True).order_by('run_at', 'id').first()
+        if job is None:
+            return None
+        Job.objects.filter(pk=job.pk).update(
+            status='RUNNING',
+            started_at=now,
+            attempts=F('attempts') + 1,
+            worker=worker_name()
+        )
+    job.refresh_from_db()
+    return job
+
+
+def claim_next_job():
+    return _claim(Job.objects.all())
+
+
+def run_job(job_id):
+    # Runs one specific job now if nobody else has claimed it (immediate mode)
+    job = _claim(Job.objects.filter(pk=job_id))
+    if job is not None:
+        execute(job)
+    return job
+
+
+def execute(job):
+    """
+    Runs a claimed job and records the outcome. Failed jobs are scheduled again
+    with exponential backoff until max_attempts is reached.
+    """
+    spec = get_task(job.task)
+    now = timezone.now
+
+    if spec is None:
+        Job.objects.filter(pk=job.pk).update(status='FAILED', error=f"Unknown task {job.task}", finished_at=now())
+        logger.error(f"Job {job.id}: unknown task {job.task}")
+        return
+
+    try:
+        result = spec.func(*job.payload.get('args', []), **job.payload.get('kwargs', {}))
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = spec.retry_delay(job.attempts)
+            Job.objects.filter(pk=job.pk).update(
+                status='PENDING', error=error, run_at=now() + timedelta(seconds=delay)
+            )
+            logger.warning(f"Job {job.id} ({job.task}) failed, retrying in {delay}s (attempt {job.attempts}/{job.max_attempts})")
+        else:
+            Job.objects.filter(pk=job.pk).update(status='FAILED', error=error, finished_at=now())
+            logger.error(f"Job {job.id} ({job.task}) failed after {job.attempts} attempts")
+        return
+
+    Job.objects.filter(pk=job.pk).update(status='SUCCEEDED', result=result, error='', finished_at=now())
+    logger.info(f"Job {job.id} ({job.task}) succeeded")
+
+
+def purge_finished_jobs():
+    # Deletes succeeded jobs older than TASK_QUEUE_RESULT_TTL seconds; failed ones are kept for inspection
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_QUEUE_RESULT_TTL)
+    deleted, _ = Job.objects.filter(status='SUCCEEDED', finished_at__lt=cutoff).delete()
+    return deleted